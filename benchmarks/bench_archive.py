@@ -0,0 +1,100 @@
+# benchmarks/bench_archive.py
+"""
+Benchmark: a 12-month dashboard load (people per day, and per weekday x hour) from the
+Parquet archive vs from the JSON that Firebase returns for `barbers/{id}/logs`.
+
+    python -m benchmarks.bench_archive [--months 12] [--per-day 60] [--repeat 3]
+
+The JSON path includes decoding the payload (as the Firebase client does) and the
+generic timestamp parse the old Dashboard used. The archive path is a memory-mapped
+read of the one column it needs. Both must produce the same counts.
+"""
+import argparse
+import json
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_scheduling import timed
+from utils import archive
+from utils.scheduling import LONDON
+
+
+def make_logs(months, per_day, seed=1):
+    """Firebase-shaped logs: {YYYY-MM-DD: {key: {name, joined_at}}}."""
+    rng = random.Random(seed)
+    first = date(2025, 1, 1)
+    logs = {}
+    for offset in range(months * 30):
+        day = first + timedelta(days=offset)
+        opening = datetime.combine(day, datetime.min.time(), tzinfo=LONDON).replace(hour=10)
+        logs[day.isoformat()] = {
+            f"k{offset:04d}{i:03d}": {
+                "name": f"Customer {i}",
+                "joined_at": (opening + timedelta(seconds=rng.randrange(12 * 3600))).isoformat(),
+            }
+            for i in range(per_day)
+        }
+    return logs
+
+
+def counts(joined: pd.Series) -> tuple:
+    """(people per day, 7x24 weekday-hour matrix) from a tz-aware timestamp series."""
+    daily = joined.dt.date.value_counts().sort_index()
+    matrix = np.zeros((7, 24), dtype=np.int64)
+    np.add.at(matrix, (joined.dt.weekday.to_numpy(), joined.dt.hour.to_numpy()), 1)
+    return daily, matrix
+
+
+def from_json(payload: str):
+    rows = [record for day in json.loads(payload).values() for record in day.values()]
+    df = pd.DataFrame(rows)
+    joined = pd.to_datetime(df["joined_at"], utc=True).dt.tz_convert(LONDON)
+    return counts(joined)
+
+
+def from_archive(barber_id, start, end):
+    table = archive.read_archive(barber_id, start, end, columns=["joined_at"])
+    return counts(table.column("joined_at").to_pandas())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--per-day", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logs = make_logs(args.months, args.per_day)
+    payload = json.dumps(logs)
+    days = sorted(date.fromisoformat(d) for d in logs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive.archive_root = lambda: Path(tmp)  # keep the benchmark's files out of the real archive
+        by_month = {}
+        for day, records in logs.items():
+            by_month.setdefault(day[:7], {})[day] = records
+        for month, month_logs in by_month.items():
+            archive.write_month("bench", month, archive.logs_to_table(month_logs))
+        archive_bytes = sum(p.stat().st_size for p in Path(tmp).rglob("*.parquet"))
+
+        json_s, (json_daily, json_matrix) = timed(lambda: from_json(payload), args.repeat)
+        arrow_s, (arrow_daily, arrow_matrix) = timed(lambda: from_archive("bench", days[0], days[-1]), args.repeat)
+
+    assert (json_matrix == arrow_matrix).all(), "weekday-hour counts differ"
+    assert json_daily.tolist() == arrow_daily.tolist(), "daily counts differ"
+
+    rows = sum(len(d) for d in logs.values())
+    print(f"{rows} log rows over {len(days)} days")
+    print(f"{'source':>8}  {'ms':>8}  {'bytes':>10}")
+    print(f"{'json':>8}  {json_s * 1000:8.1f}  {len(payload):>10}")
+    print(f"{'archive':>8}  {arrow_s * 1000:8.1f}  {archive_bytes:>10}")
+    print(f"speed-up: {json_s / arrow_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/bench_resilience.py
+"""
+Rerun latency against a misbehaving backend, bare vs behind ResilientStorage.
+
+    python -m benchmarks.bench_resilience [--sessions 8] [--duration 20] [--hang-rate 0.01]
+                                          [--error-rate 0.05] [--outage 4] [--deadline 1.0] [--think 0.05]
+
+The backend is FaultyStorage over an in-memory store: every call gets base latency plus
+jitter, some fail, some hang for --hang seconds, and halfway through there is a full
+outage of --outage seconds. Each session loops over a kiosk-like rerun (settings,
+walk-ins, today's bookings) with --think seconds between reruns. A rerun "fails" if any
+of its reads raised, i.e. the page would have shown an error instead of the queue.
+"""
+import argparse
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.scheduling import LONDON
+from utils.storage import create_storage
+from utils.storage.faulty import FaultyStorage
+from utils.storage.resilient import ResilientStorage
+
+BARBER_ID = "bench"
+
+
+def seed(storage) -> None:
+    today = datetime.now(LONDON).date().isoformat()
+    storage.reference(f"barbers/{BARBER_ID}").set({
+        "settings": {"avg_cut_duration": 20, "open_hour": 9, "close_hour": 18},
+        "walkins": {f"w{i:03d}": {"name": f"Walk-in {i}", "joined_at": f"{today}T10:{i % 60:02d}:00+00:00"}
+                    for i in range(20)},
+        "bookings": {today: {f"b{i:03d}": {"name": f"Booking {i}", "slot": f"{today}T{9 + i % 9:02d}:00:00+00:00"}
+                             for i in range(10)}},
+    })
+
+
+def rerun(storage) -> None:
+    storage.reference(f"barbers/{BARBER_ID}/settings").get()
+    storage.reference(f"barbers/{BARBER_ID}/walkins").get()
+    today = datetime.now(LONDON).date().isoformat()
+    storage.reference(f"barbers/{BARBER_ID}/bookings").order_by_key().start_at(today).end_at(today).get()
+
+
+def run(storage, faulty: FaultyStorage, sessions: int, duration: float, outage: float, think: float) -> dict:
+    samples, lock = [], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def session():
+        while time.monotonic() < deadline:
+            t0 = time.perf_counter()
+            try:
+                rerun(storage)
+                failed = False
+            except Exception:
+                failed = True
+            with lock:
+                samples.append((time.perf_counter() - t0, failed))
+            time.sleep(think)
+
+    rerun(storage)  # warm: the resilient side has a last good copy to fall back on
+    threads = [threading.Thread(target=session, daemon=True) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration / 2)
+    faulty.outage(outage)
+    for thread in threads:
+        thread.join()
+
+    ms = np.array([s[0] for s in samples]) * 1000
+    return {
+        "reruns": len(samples),
+        "failed": sum(s[1] for s in samples) / len(samples) * 100,
+        "p50": np.percentile(ms, 50),
+        "p95": np.percentile(ms, 95),
+        "p99": np.percentile(ms, 99),
+        "max": ms.max(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20, help="seconds per mode")
+    parser.add_argument("--latency", type=float, default=0.02, help="base latency per call, seconds")
+    parser.add_argument("--jitter", type=float, default=0.03, help="extra uniform latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--hang-rate", type=float, default=0.01)
+    parser.add_argument("--hang", type=float, default=8.0, help="how long a hung call takes, seconds")
+    parser.add_argument("--outage", type=float, default=4.0, help="full outage halfway through, seconds")
+    parser.add_argument("--deadline", type=float, default=1.0, help="ResilientStorage per-call deadline")
+    parser.add_argument("--think", type=float, default=0.05, help="pause between a session's reruns, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'mode':>9}  {'reruns':>6}  {'failed':>7}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'max ms':>8}")
+    for mode in ("bare", "resilient"):
+        inner = create_storage("memory")
+        seed(inner)
+        faulty = FaultyStorage(inner, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                               hang_rate=args.hang_rate, hang=args.hang, seed=args.seed)
+        storage = faulty
+        if mode == "resilient":
+            storage = ResilientStorage(faulty, deadline=args.deadline, cooldown=args.outage / 2, workers=64)
+        r = run(storage, faulty, args.sessions, args.duration, args.outage, args.think)
+        print(f"{mode:>9}  {r['reruns']:>6}  {r['failed']:6.1f}%  {r['p50']:8.1f}  {r['p95']:8.1f}  "
+              f"{r['p99']:8.1f}  {r['max']:8.1f}")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
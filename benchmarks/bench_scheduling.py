@@ -0,0 +1,114 @@
+# benchmarks/bench_scheduling.py
+"""
+Micro-benchmark: the live queue from a BarberSchedule vs the old per-page loop.
+
+    python -m benchmarks.bench_scheduling [--sizes 10 100 1000 10000] [--legacy-max 2000]
+
+Each size is the number of entries on the day (half bookings, half walk-ins). "engine" is
+a cold build (sync a fresh schedule and read its queue); the legacy loop, kept here as the
+baseline, is quadratic, so it is skipped above --legacy-max. "join" is one more walk-in
+added to an already maintained BarberSchedule, i.e. the cost of a kiosk join.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from utils import scheduling
+
+DURATION = 25
+
+
+def make_day(n, seed=1):
+    rng = random.Random(seed)
+    now = datetime(2025, 5, 3, 9, 0, tzinfo=scheduling.LONDON)
+    step = timedelta(minutes=DURATION)
+    bookings = {
+        f"b{i}": {"name": f"B{i}", "slot": (now + step * rng.randrange(0, 4 * n)).isoformat()}
+        for i in range(n // 2)
+    }
+    walkins = {
+        f"w{i}": {"name": f"W{i}", "joined_at": (now + timedelta(seconds=i)).isoformat()}
+        for i in range(n - n // 2)
+    }
+    return walkins, bookings, now
+
+
+def legacy_queue(walkins, bookings, now, open_time):
+    duration = timedelta(minutes=DURATION)
+    sorted_walkins = sorted(walkins.items(), key=lambda x: x[1]["joined_at"])
+    sorted_bookings = sorted(bookings.items(), key=lambda x: x[1]["slot"])
+    queue, used_slots = [], []
+    for _, booking in sorted_bookings:
+        start = datetime.fromisoformat(booking["slot"]).replace(tzinfo=scheduling.LONDON)
+        used_slots.append((start, start + duration))
+    walkin_time = max(now, open_time)
+    for _, walkin in sorted_walkins:
+        while any(start <= walkin_time < end for start, end in used_slots):
+            walkin_time += duration
+        used_slots.append((walkin_time, walkin_time + duration))
+        queue.append({"name": walkin["name"], "source": "walkin", "start": walkin_time})
+        walkin_time += duration
+    for _, booking in sorted_bookings:
+        start = datetime.fromisoformat(booking["slot"]).replace(tzinfo=scheduling.LONDON)
+        queue.append({"name": booking["name"], "source": "booking", "start": start})
+    return sorted(queue, key=lambda x: x["start"])
+
+
+def engine_queue(walkins, bookings, now):
+    schedule = scheduling.BarberSchedule(DURATION)
+    schedule.sync(walkins, bookings)
+    schedule.set_start(now)
+    return schedule.queue()
+
+
+def join_cost(walkins, bookings, now, repeat):
+    schedule = scheduling.BarberSchedule(DURATION)
+    schedule.sync(walkins, bookings)
+    schedule.set_start(now)
+    schedule.walkin_starts()
+    joined_at = (now + timedelta(days=1)).isoformat()
+
+    def join():
+        result = schedule.add_walkin("new", {"name": "New", "joined_at": joined_at})
+        schedule.remove("new")
+        return result
+
+    return timed(join, repeat)[0]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10_000])
+    parser.add_argument("--legacy-max", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'entries':>8}  {'engine ms':>10}  {'legacy ms':>10}  {'speed-up':>8}  {'join us':>8}")
+    for n in args.sizes:
+        walkins, bookings, now = make_day(n)
+        engine_s, queue = timed(lambda: engine_queue(walkins, bookings, now), args.repeat)
+
+        if n <= args.legacy_max:
+            legacy_s, expected = timed(lambda: legacy_queue(walkins, bookings, now, now), args.repeat)
+            assert [p["start"] for p in queue] == [p["start"] for p in expected], "engine disagrees with legacy loop"
+            legacy_col, ratio = f"{legacy_s * 1000:10.2f}", f"{legacy_s / engine_s:7.1f}x"
+        else:
+            legacy_col, ratio = f"{'skipped':>10}", f"{'-':>8}"
+
+        join_s = join_cost(walkins, bookings, now, args.repeat)
+        print(f"{n:>8}  {engine_s * 1000:10.2f}  {legacy_col}  {ratio}  {join_s * 1e6:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
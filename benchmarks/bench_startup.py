@@ -0,0 +1,113 @@
+# benchmarks/bench_startup.py
+"""
+Cold start per page: each page runs in a fresh Python process (as after a deploy or a
+server restart) against a seeded in-memory backend.
+
+    python -m benchmarks.bench_startup [--pages kiosk admin ...] [--repeat 3]
+
+- import:  the import block at the top of the page, after Streamlit itself is loaded
+- first:   the first render (AppTest run), including anything imported lazily on the way
+- warm:    a second render in the same process
+- heavy:   which of pandas / Plotly / pyarrow / streamlit_calendar / firebase_admin got loaded
+
+Times are the best of --repeat fresh processes.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = {
+    "main": ("main.py", False),
+    "portal": ("pages/barber_main.py", False),
+    "kiosk": ("pages/1_Kiosk_View.py", False),
+    "admin-login": ("pages/2_Admin_Panel.py", False),
+    "admin": ("pages/2_Admin_Panel.py", True),
+    "dashboard": ("pages/3_Dashboard.py", False),
+    "booking": ("pages/4_Book_Appointment.py", False),
+}
+HEAVY = ("pandas", "plotly.express", "pyarrow", "streamlit_calendar", "firebase_admin")
+
+
+def _header_imports(path: Path) -> str:
+    """The import block at the top of a page (imports further down count as render time)."""
+    nodes = []
+    for node in ast.parse(path.read_text(encoding="utf-8")).body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            break
+        nodes.append(node)
+    return "\n".join(ast.unparse(node) for node in nodes)
+
+
+def child(page: str) -> dict:
+    """Runs in the fresh process: measure one page and return the numbers."""
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.load_test import BARBER_ID, seed
+    from utils.journal import Journal, set_journal
+    from utils.storage import create_storage, set_storage
+
+    storage = create_storage("memory")
+    seed(storage)
+    set_storage(storage)
+    set_journal(Journal(str(Path(tempfile.mkdtemp()) / "journal.sqlite3")))
+
+    path, admin = PAGES[page]
+    t0 = time.perf_counter()
+    exec(_header_imports(ROOT / path), {})
+    import_ms = (time.perf_counter() - t0) * 1000
+
+    app = AppTest.from_file(str(ROOT / path), default_timeout=60)
+    app.session_state["barber_id"] = BARBER_ID
+    app.session_state[f"is_admin_{BARBER_ID}"] = admin
+    t0 = time.perf_counter()
+    app.run()
+    first_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    app.run()
+    warm_ms = (time.perf_counter() - t0) * 1000
+
+    return {
+        "import_ms": import_ms,
+        "first_ms": first_ms,
+        "warm_ms": warm_ms,
+        "errors": len(app.exception),
+        "heavy": [name for name in HEAVY if name in sys.modules],
+    }
+
+
+def measure(page: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", page],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGES), default=list(PAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--child", choices=list(PAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+
+    print(f"{'page':>12}  {'import ms':>9}  {'first ms':>8}  {'warm ms':>7}  heavy modules loaded")
+    for page in args.pages:
+        runs = [measure(page) for _ in range(args.repeat)]
+        best = {key: min(run[key] for run in runs) for key in ("import_ms", "first_ms", "warm_ms")}
+        errors = " (errors)" if any(run["errors"] for run in runs) else ""
+        print(f"{page:>12}  {best['import_ms']:9.1f}  {best['first_ms']:8.1f}  {best['warm_ms']:7.1f}  "
+              f"{', '.join(runs[-1]['heavy']) or '-'}{errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+# benchmarks/load_test.py
+"""
+Load test: many kiosks, admins and customers booking at once, each a Streamlit
+`AppTest` session running the real pages against a local storage backend.
+
+    python -m benchmarks.load_test [--kiosks 6] [--admins 2] [--bookers 4] [--duration 30]
+                                   [--backend memory|sqlite] [--think 0.2] [--save] [--compare FILE]
+
+- kiosk:  reruns the Kiosk page (its auto-refresh) and now and then joins the queue
+- admin:  reruns the Admin Panel and marks the first person in the queue as done, or
+          exports today's logs (an export without a download button is an error)
+- booker: opens the Booking page, picks a day in the next week and books a slot
+
+Reports p50/p95/p99 rerun latency per page, storage calls and bytes moved per rerun
+(listener traffic is counted separately). With --save the results go to
+benchmarks/results/load_<time>.json; --compare prints the change against an earlier run.
+"""
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.testing.v1 import AppTest
+
+from utils.journal import Journal, set_journal
+from utils.scheduling import LONDON
+from utils.storage import Reference, Storage, create_storage, set_storage
+
+BARBER_ID = "load_test"
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS = ROOT / "benchmarks" / "results"
+PAGES = {
+    "kiosk": ROOT / "pages" / "1_Kiosk_View.py",
+    "admin": ROOT / "pages" / "2_Admin_Panel.py",
+    "booker": ROOT / "pages" / "4_Book_Appointment.py",
+}
+USER_KEY = "_load_test_user"
+
+# AppTest sets up and tears down one process-wide Streamlit runtime per run, so page runs
+# take turns: users interleave rerun by rerun, as sessions do on one busy server process.
+# Latency is timed inside the lock, so it excludes waiting for another user's turn.
+_app_lock = threading.Lock()
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, default=str)) if value is not None else 0
+
+
+class MeteredStorage(Storage):
+    """Counts calls and JSON bytes per simulated user (the session running the page)."""
+
+    def __init__(self, inner: Storage):
+        super().__init__()
+        self.inner = inner
+        self.name = inner.name
+        self._counts = defaultdict(lambda: [0, 0])
+        self._count_lock = threading.Lock()
+
+    def _record(self, nbytes: int, user=None) -> None:
+        if user is None:
+            ctx = get_script_run_ctx(suppress_warning=True)
+            user = ctx.session_state[USER_KEY] if ctx and USER_KEY in ctx.session_state else "other"
+        with self._count_lock:
+            self._counts[user][0] += 1
+            self._counts[user][1] += nbytes
+
+    def take(self, user: str) -> tuple:
+        """(calls, bytes) recorded for `user` since the last take()."""
+        with self._count_lock:
+            return tuple(self._counts.pop(user, (0, 0)))
+
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    def get(self, path, shallow=False):
+        value = self.inner.get(path, shallow=shallow)
+        self._record(_size(value))
+        return value
+
+    def set(self, path, value):
+        self._record(_size(value))
+        self.inner.set(path, value)
+
+    def update(self, path, values):
+        self._record(_size(values))
+        self.inner.update(path, values)
+
+    def delete(self, path):
+        self._record(0)
+        self.inner.delete(path)
+
+    def push(self, path, value=""):
+        self._record(_size(value))
+        return self.inner.push(path, value)
+
+    def transaction(self, path, fn):
+        value = self.inner.transaction(path, fn)
+        self._record(_size(value))
+        return value
+
+    def query(self, path, order_by, start_at=None, end_at=None, limit_to_first=None):
+        value = self.inner.query(path, order_by, start_at, end_at, limit_to_first)
+        self._record(_size(value))
+        return value
+
+    def listen(self, path, callback):
+        def counted(event):
+            self._record(_size(event.data), user="listeners")
+            callback(event)
+        return self.inner.listen(path, counted)
+
+
+def seed(storage: Storage) -> None:
+    storage.reference(f"barbers/{BARBER_ID}").set({
+        "settings": {"shop_name": "Load Test", "avg_cut_duration": 20, "open_hour": 0, "close_hour": 24},
+        "config": {"admin_pin": "0000"},
+        "migrations": {"bookings_by_date": {"done": True}},
+    })
+
+
+class User:
+    def __init__(self, role: str, index: int, rng: random.Random):
+        self.role = role
+        self.name = f"{role}-{index}"
+        self.rng = rng
+        self.app = AppTest.from_file(str(PAGES[role]), default_timeout=60)
+        self.app.session_state["barber_id"] = BARBER_ID
+        self.app.session_state[USER_KEY] = self.name
+        self.app.session_state[f"is_admin_{BARBER_ID}"] = role == "admin"
+        self.joins = 0
+
+    def step(self) -> None:
+        """One interaction: a rerun, or a rerun triggered by a click."""
+        app = self.app
+        if self.role == "kiosk" and app.text_input and self.rng.random() < 0.2:
+            self.joins += 1
+            app.text_input[0].input(f"{self.name} customer {self.joins}")
+            app.button[0].click()
+        elif self.role == "admin" and self.rng.random() < 0.1:
+            self.export(self.rng.choice(["csv", "csv.gz", "parquet"]))
+            return
+        elif self.role == "admin":
+            done = [b for b in app.button if b.key and b.key.startswith("done_")]
+            if done:
+                done[0].click()
+        elif self.role == "booker" and app.date_input:
+            confirm = [b for b in app.button if "Confirm Booking" in b.label]
+            if confirm and app.selectbox and app.text_input:
+                app.text_input[0].input(f"Booker {self.name}")
+                app.text_input[1].input(f"07{self.rng.randrange(10**9):09d}")
+                options = app.selectbox[0].options
+                app.selectbox[0].set_value(options[self.rng.randrange(min(3, len(options)))])
+                confirm[0].click()
+            else:
+                day = datetime.now(LONDON).date() + timedelta(days=self.rng.randrange(7))
+                app.date_input(key="booking_date").set_value(day)
+        app.run()
+
+    def export(self, fmt: str) -> None:
+        """Export today's logs; an export that yields no download button counts as an error."""
+        app = self.app
+        app.radio(key=f"export_format_{BARBER_ID}").set_value(fmt)
+        next(b for b in app.button if b.label == "⬇️ Export Logs").click()
+        app.run()
+        downloaded = any(d.label == "📥 Download" for d in app.download_button)
+        if app.error or not (downloaded or any("No logs found" in i.value for i in app.info)):
+            raise AssertionError(f"{fmt} export gave no download: {[e.value for e in app.error]}")
+
+
+def run_user(user: User, deadline: float, think: float, metered: MeteredStorage, samples: list, lock) -> None:
+    with _app_lock:
+        user.app.run()  # first load isn't measured
+    metered.take(user.name)
+    while time.monotonic() < deadline:
+        with _app_lock:
+            t0 = time.perf_counter()
+            try:
+                user.step()
+                error = bool(user.app.exception)
+            except Exception:
+                error = True
+            elapsed = time.perf_counter() - t0
+        calls, nbytes = metered.take(user.name)
+        with lock:
+            samples.append({"page": user.role, "ms": elapsed * 1000, "calls": calls, "bytes": nbytes, "error": error})
+        time.sleep(think * user.rng.uniform(0.5, 1.5))
+
+
+def summarise(samples: list) -> dict:
+    by_page = defaultdict(list)
+    for sample in samples:
+        by_page[sample["page"]].append(sample)
+    summary = {}
+    for page, rows in sorted(by_page.items()):
+        ms = np.array([r["ms"] for r in rows])
+        summary[page] = {
+            "reruns": len(rows),
+            "errors": sum(r["error"] for r in rows),
+            "p50_ms": float(np.percentile(ms, 50)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)),
+            "calls_per_rerun": float(np.mean([r["calls"] for r in rows])),
+            "bytes_per_rerun": float(np.mean([r["bytes"] for r in rows])),
+        }
+    return summary
+
+
+def print_summary(summary: dict, baseline: dict = None) -> None:
+    print(f"{'page':>7}  {'reruns':>6}  {'errors':>6}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'calls':>6}  {'KB':>7}")
+    for page, s in summary.items():
+        print(f"{page:>7}  {s['reruns']:>6}  {s['errors']:>6}  {s['p50_ms']:8.1f}  {s['p95_ms']:8.1f}  "
+              f"{s['p99_ms']:8.1f}  {s['calls_per_rerun']:6.1f}  {s['bytes_per_rerun'] / 1024:7.1f}")
+        old = (baseline or {}).get(page)
+        if old:
+            change = {k: (s[k] - old[k]) / old[k] * 100 for k in ("p50_ms", "p95_ms", "p99_ms") if old[k]}
+            print(f"{'':>7}  vs baseline: " + "  ".join(f"{k[:3]} {v:+.0f}%" for k, v in change.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kiosks", type=int, default=6)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument("--bookers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause between a user's reruns, seconds")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help="store results under benchmarks/results/")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        inner = create_storage(args.backend, sqlite_path=str(Path(tmp) / "load.sqlite3"))
+        metered = MeteredStorage(inner)
+        seed(inner)
+        set_storage(metered)
+        journal = Journal(str(Path(tmp) / "journal.sqlite3"))
+        set_journal(journal)
+
+        rng = random.Random(args.seed)
+        users = [
+            User(role, i, random.Random(rng.random()))
+            for role, count in (("kiosk", args.kiosks), ("admin", args.admins), ("booker", args.bookers))
+            for i in range(count)
+        ]
+        samples, lock = [], threading.Lock()
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=run_user, args=(user, deadline, args.think, metered, samples, lock))
+            for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        while journal.pending():
+            journal.flush_once()  # what the background flusher hasn't sent yet
+        journal.close()
+        final = inner.get(f"barbers/{BARBER_ID}") or {}
+        listener_calls, listener_bytes = metered.take("listeners")
+        inner.close()
+
+    summary = summarise(samples)
+    result = {
+        "run_at": datetime.now(LONDON).isoformat(),
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "pages": summary,
+        "listeners": {"events": listener_calls, "bytes": listener_bytes},
+        "final_state": {
+            "queued_walkins": len(final.get("walkins") or {}),
+            "served": sum(len(day) for day in (final.get("served") or {}).values()),
+            "bookings": sum(len(day) for day in (final.get("bookings") or {}).values()),
+        },
+    }
+
+    baseline = json.loads(args.compare.read_text())["pages"] if args.compare else None
+    print_summary(summary, baseline)
+    print(f"listener events: {listener_calls} ({listener_bytes / 1024:.1f} KB)  final: {result['final_state']}")
+
+    if args.save:
+        RESULTS.mkdir(exist_ok=True)
+        path = RESULTS / f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        path.write_text(json.dumps(result, indent=2))
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
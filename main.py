@@ -1,18 +1,24 @@
 import streamlit as st
-from utils.firebase_utils import get_all_barber_ids
+from utils.firebase_utils import get_barber_directory
+from utils.instrumentation import finish_rerun, start_rerun
 from utils.session import set_barber_id
 
 st.set_page_config(page_title="Choose Your Barber", layout="centered")
+start_rerun("main")
 
 st.title("💈 Welcome to the Barber Queue App")
 st.markdown("Please select your barber shop:")
 
-barber_ids = get_all_barber_ids()
-selected = st.selectbox("Barber:", barber_ids)
+directory = get_barber_directory()
+selected = st.selectbox(
+    "Barber:",
+    list(directory.keys()),
+    format_func=lambda barber_id: directory[barber_id].get("shop_name") or barber_id.replace("_", " ").title()
+)
 
 if selected and st.button("Go to Barber Portal"):
     set_barber_id(selected)  # Persist selected barber in session
     #st.write(f"Selected Barber ID: {selected}")  # Debugging line
     st.switch_page("pages/barber_main.py")  # Switch to the barber portal page
 
-
+finish_rerun()
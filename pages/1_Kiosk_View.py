@@ -1,103 +1,66 @@
+import time
 import streamlit as st
-import json
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from streamlit_autorefresh import st_autorefresh
-from utils.firebase_utils import get_barber_config
+from utils.firebase_utils import get_barber_config, join_queue
+from utils.instrumentation import finish_rerun, fragment_rerun, span, start_rerun
+from utils.live import get_feed, get_live_queue
 from utils.session import get_barber_id
+from utils.storage import StorageUnavailable, get_storage
 
 
 # --- Page config ---
 st.set_page_config(page_title="Kiosk View", layout="wide")
+start_rerun("kiosk")
 
 # --- Get barber ID from query params ---
 query_params = st.query_params
 barber_id = get_barber_id()
-config = get_barber_config(barber_id)
+try:
+    config = get_barber_config(barber_id)
+except StorageUnavailable:
+    config = {}  # defaults until the database answers; the kiosk stays up
 st.info(f"Barber ID: {barber_id}")
 
-# --- Firebase init (singleton) ---
-if not firebase_admin._apps:
-    cred = credentials.Certificate(json.loads(st.secrets["firebase_creds"]))
-    firebase_admin.initialize_app(cred, {'databaseURL': st.secrets["firebase_db_url"]})
-
-# --- Refs for current barber ---
-walkin_ref = db.reference(f"barbers/{barber_id}/walkins")
-booking_ref = db.reference(f"barbers/{barber_id}/bookings")
-
 # --- Constants ---
-avg_cut_duration = 25
-open_time = datetime.now(ZoneInfo("Europe/London")).replace(hour=10, minute=0, second=0, microsecond=0)
-now = datetime.now(ZoneInfo("Europe/London"))
+avg_cut_duration = int(config.get("avg_cut_duration", 25))
+open_hour = int(config.get("open_hour", 10))
+LIVE_REFRESH_SECONDS = 5      # the live queue redraws on its own; the rest of the page doesn't
+CONFIRMATION_SECONDS = 20
 
 # --- Titles ---
 st.title(f"💈 Queue Tracker – {barber_id.replace('_', ' ').title()} Kiosk")
-st_autorefresh(interval=20_000, limit=None, key="kiosk_refresh")
 
-# --- Confirmation Message ---
-if "confirmation_message" in st.session_state:
-    m = st.session_state["confirmation_message"]
+
+# --- Confirmation Message (clears itself after CONFIRMATION_SECONDS) ---
+@st.fragment(run_every=LIVE_REFRESH_SECONDS if "confirmation_message" in st.session_state else None)
+def confirmation_message():
+    m = st.session_state.get("confirmation_message")
+    if m is None:
+        return
+    if time.time() >= m["expires_at"]:
+        del st.session_state["confirmation_message"]
+        return
     st.success(
         f"✅ {m['name']}, you're in line!\n\n"
         f"You're number **{m['position']}**.\n"
         f"⏳ Wait: **{m['wait']} mins**\n"
         f"🕒 Est. start: **{m['time']}**"
     )
-    if st_autorefresh(interval=20_000, limit=1, key="clear_confirmation_refresh"):
-        del st.session_state["confirmation_message"]
-
-# --- User Prompt ---
-st.info("Enter your full name to join the queue. Names are hidden for privacy.")
-
-# --- Queue Data ---
-try:
-    walkins = walkin_ref.get() or {}
-    bookings = booking_ref.get() or {}
-
-    sorted_walkins = sorted(
-        [(k, v) for k, v in walkins.items() if "joined_at" in v],
-        key=lambda x: x[1]["joined_at"]
-    )
 
-    sorted_bookings = sorted(
-        [(k, v) for k, v in bookings.items() if "slot" in v],
-        key=lambda x: x[1]["slot"]
-    )
 
-    # --- Time slot building ---
-    queue = []
-    used_slots = []
+confirmation_message()
 
-    for _, booking in sorted_bookings:
-        start = datetime.fromisoformat(booking["slot"]).replace(tzinfo=ZoneInfo("Europe/London"))
-        end = start + timedelta(minutes=avg_cut_duration)
-        used_slots.append((start, end))
-
-    walkin_time = max(now, open_time)
-    for _, walkin in sorted_walkins:
-        while any(start <= walkin_time < end for start, end in used_slots):
-            walkin_time += timedelta(minutes=avg_cut_duration)
-
-        estimated_start = walkin_time
-        estimated_end = estimated_start + timedelta(minutes=avg_cut_duration)
-        used_slots.append((estimated_start, estimated_end))
-        queue.append({"source": "walkin", "start": estimated_start})
-        walkin_time = estimated_end
+# --- User Prompt ---
+st.info("Enter your full name to join the queue. Names are hidden for privacy.")
 
-    for _, person in sorted_bookings:
-        queue.append({
-            "source": "booking",
-            "start": datetime.fromisoformat(person["slot"]).replace(tzinfo=ZoneInfo("Europe/London"))
-        })
 
-    queue_sorted = sorted(queue, key=lambda x: x["start"])
+# --- Queue Data (computed once per change for every screen in the process) ---
+def load_queue(now: datetime):
+    """The shared queue as of `now`; `.stale` when the feed can't be read and it's the last one known."""
+    live = get_live_queue(barber_id, avg_cut_duration)
+    return live, live.view(max(now, now.replace(hour=open_hour, minute=0, second=0, microsecond=0)))
 
-except Exception as e:
-    st.error("⚠️ Failed to load queue data.")
-    st.exception(e)
-    st.stop()
 
 # --- Form ---
 with st.form("add_name_form"):
@@ -106,55 +69,62 @@ with st.form("add_name_form"):
 
     if submit and name.strip():
         name_clean = name.strip().title()
-        already_in_queue = any(p.get("name", "") == name_clean for _, p in sorted_walkins)
+        now = datetime.now(ZoneInfo("Europe/London"))
+        live, view = load_queue(now)
+        already_in_queue = any(p.get("name", "") == name_clean for p in view.walkins.values())
 
         if already_in_queue:
             st.warning(f"⚠️ {name_clean}, you're already in the queue!")
         else:
-            now_iso = now.isoformat()
-            walkin_ref.push({"name": name_clean, "joined_at": now_iso})
-            db.reference(f"barbers/{barber_id}/logs/{now.strftime('%Y-%m-%d')}").push({
-                "name": name_clean,
-                "joined_at": now_iso
-            })
-
-            # Slot Calculation
-            all_used = [
-                (datetime.fromisoformat(b["slot"]).replace(tzinfo=ZoneInfo("Europe/London")),
-                 datetime.fromisoformat(b["slot"]).replace(tzinfo=ZoneInfo("Europe/London")) + timedelta(minutes=avg_cut_duration))
-                for _, b in sorted_bookings
-            ]
-
-            walkin_time = max(now, open_time)
-            while any(start <= walkin_time < end for start, end in all_used):
-                walkin_time += timedelta(minutes=avg_cut_duration)
-
-            est_start = walkin_time
-            est_wait = int((est_start - now).total_seconds() / 60)
+            # Queue entry, log, counters and availability in one journaled write:
+            # saved locally at once and sent to the database in the background
+            with span("queue.join"):
+                feed = None if view.stale else get_feed(barber_id)
+                position, est_start = join_queue(barber_id, name_clean, now, live, feed)
+            est_wait = max(0, int((est_start - now).total_seconds() / 60))
 
             st.session_state["confirmation_message"] = {
                 "name": name_clean,
-                "position": len(queue_sorted) + 1,
+                "position": position,
                 "wait": est_wait,
-                "time": est_start.strftime('%H:%M')
+                "time": est_start.strftime('%H:%M'),
+                "expires_at": time.time() + CONFIRMATION_SECONDS,
             }
 
-            st.experimental_set_query_params(added="1", barber=barber_id)
+            st.query_params["added"] = "1"
+            st.query_params["barber"] = barber_id
             st.rerun()
 
-# --- Live Queue ---
-st.divider()
-st.subheader("📋 Live Queue")
-
-if queue_sorted:
-    for i, person in enumerate(queue_sorted):
-        wait_mins = max(0, int((person["start"] - now).total_seconds() / 60))
-        end = person["start"] + timedelta(minutes=avg_cut_duration)
-
-        st.markdown(
-            f"### Person {i + 1} ({'Booking' if person['source'] == 'booking' else 'Walk-in'})  \n"
-            f"🕒 Wait: {wait_mins} mins  \n"
-            f"📅 Est: {person['start'].strftime('%H:%M')} – {end.strftime('%H:%M')}"
-        )
-else:
-    st.info("No one is currently in the queue.")
\ No newline at end of file
+
+# --- Live Queue (a fragment: each tick reruns only this section) ---
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_queue():
+    with fragment_rerun("kiosk.queue"):
+        st.divider()
+        st.subheader("📋 Live Queue")
+
+        now = datetime.now(ZoneInfo("Europe/London"))
+        _, view = load_queue(now)
+        if view.stale:
+            st.warning("⚠️ The live queue is delayed. Showing the last known queue.")
+        elif get_storage().degraded:
+            st.caption("⚠️ Connection to the database is unstable; times may be slightly out of date.")
+
+        queue_sorted = view.queue
+        if queue_sorted:
+            for i, person in enumerate(queue_sorted):
+                wait_mins = max(0, int((person["start"] - now).total_seconds() / 60))
+                end = person["start"] + timedelta(minutes=avg_cut_duration)
+
+                st.markdown(
+                    f"### Person {i + 1} ({'Booking' if person['source'] == 'booking' else 'Walk-in'})  \n"
+                    f"🕒 Wait: {wait_mins} mins  \n"
+                    f"📅 Est: {person['start'].strftime('%H:%M')} – {end.strftime('%H:%M')}"
+                )
+        else:
+            st.info("No one is currently in the queue.")
+
+
+live_queue()
+
+finish_rerun()
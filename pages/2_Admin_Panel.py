@@ -1,56 +1,46 @@
 import streamlit as st
-import json
-import firebase_admin
-from firebase_admin import credentials, db
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from streamlit_autorefresh import st_autorefresh
-import pandas as pd
-from io import StringIO
-from streamlit_calendar import calendar
 
-from utils.firebase_utils import get_barber_config
-from utils.session import get_barber_id
+from utils.firebase_utils import complete_queue_entries, update_barber_settings
+from utils.bookings import get_bookings_between
+from utils.instrumentation import allow_profiling, finish_rerun, fragment_rerun, render_diagnostics, span, start_rerun
+from utils.journal import get_journal
+from utils.live import get_feed, get_live_queue
+from utils.session import get_barber_id, rerun_fragment
+from utils.snapshot import load_barber_snapshot
 
 barber_id = get_barber_id()
 
 
 # --- Page Config ---
 st.set_page_config(page_title="Admin Panel", layout="wide")
+start_rerun("admin")
 
-# --- Init Firebase (once) ---
-if not firebase_admin._apps:
-    cred = credentials.Certificate(json.loads(st.secrets["firebase_creds"]))
-    firebase_admin.initialize_app(cred, {'databaseURL': st.secrets["firebase_db_url"]})
 
+# --- Load barber config (and the PIN, until logged in) in one concurrent fetch ---
+admin_key = f"is_admin_{barber_id}"
+if admin_key not in st.session_state:
+    st.session_state[admin_key] = False
 
-# --- Load barber config ---
-config = get_barber_config(barber_id)
+snapshot = load_barber_snapshot(
+    barber_id, parts=("settings",) if st.session_state[admin_key] else ("settings", "admin_pin")
+)
+config = snapshot.settings
 
 st.info(f"Barber ID: {barber_id}")
 
-# --- Firebase Refs for this barber ---
-walkin_ref = db.reference(f"barbers/{barber_id}/walkins")
-booking_ref = db.reference(f"barbers/{barber_id}/bookings")
-pin_ref = db.reference(f"barbers/{barber_id}/config/admin_pin")
-
-avg_cut_duration = 25
+avg_cut_duration = int(config.get("avg_cut_duration", 25))
+open_hour = int(config.get("open_hour", 10))
 now = datetime.now(ZoneInfo("Europe/London"))
-open_time = now.replace(hour=10, minute=0, second=0, microsecond=0)
 
 # --- PIN Login Check ---
 st.title(f"🔐 Admin Panel – {barber_id.replace('_', ' ').title()}")
 
-admin_key = f"is_admin_{barber_id}"
-if admin_key not in st.session_state:
-    st.session_state[admin_key] = False
-
-stored_pin = pin_ref.get()
-
 if not st.session_state[admin_key]:
     entered_pin = st.text_input("Enter Admin PIN:", type="password")
     if st.button("Login"):
-        if entered_pin == stored_pin:
+        if entered_pin == snapshot.admin_pin:
             st.session_state[admin_key] = True
             st.success("✅ Access granted.")
             st.rerun()
@@ -58,123 +48,132 @@ if not st.session_state[admin_key]:
             st.error("❌ Incorrect PIN.")
     st.stop()
 
+allow_profiling()  # `?profile=1` only works for sessions that got past the PIN
+
 if st.button("🚪 Logout"):
     st.session_state[admin_key] = False
+    allow_profiling(False)
     st.rerun()
 
+# Export (pyarrow) and calendar modules load once past the PIN check, not on the login screen
+from streamlit_calendar import calendar
+from utils.export import FORMATS, export_logs
+
 # st.write("Session State:", st.session_state) - "code to check session state (ideally per barber rather than globally)"
 
-# --- Queue Display ---
-st.subheader("📋 Current Queue")
-
-walkins = walkin_ref.get() or {}
-bookings = booking_ref.get() or {}
-
-# Sort both
-sorted_walkins = sorted(walkins.items(), key=lambda x: x[1]["joined_at"])
-sorted_bookings = sorted(bookings.items(), key=lambda x: x[1]["slot"])
-
-queue = []
-used_slots = []
-
-# Add booking slots
-for _, booking in sorted_bookings:
-    try:
-        start = datetime.fromisoformat(booking["slot"]).replace(tzinfo=ZoneInfo("Europe/London"))
-        end = start + timedelta(minutes=avg_cut_duration)
-        used_slots.append((start, end))
-    except Exception:
-        continue
-
-# Assign walk-ins dynamically
-walkin_time = max(now, open_time)
-for _, walkin in sorted_walkins:
-    while any(start <= walkin_time < end for start, end in used_slots):
-        walkin_time += timedelta(minutes=avg_cut_duration)
-
-    estimated_start = walkin_time
-    estimated_end = estimated_start + timedelta(minutes=avg_cut_duration)
-    used_slots.append((estimated_start, estimated_end))
-
-    queue.append({
-        "name": walkin["name"],
-        "source": "walkin",
-        "start": estimated_start
-    })
-
-    walkin_time = estimated_end
-
-# Add bookings
-for _, booking in sorted_bookings:
-    try:
-        start = datetime.fromisoformat(booking["slot"]).replace(tzinfo=ZoneInfo("Europe/London"))
-        queue.append({
-            "name": booking["name"],
-            "source": "booking",
-            "start": start
-        })
-    except Exception:
-        continue
-
-queue_sorted = sorted(queue, key=lambda x: x["start"])
-
-# --- Display Queue ---
-if queue_sorted:
-    for i, person in enumerate(queue_sorted):
-        wait_mins = int((person["start"] - now).total_seconds() / 60)
-        end = person["start"] + timedelta(minutes=avg_cut_duration)
-
-        col1, col2 = st.columns([5, 1])
-        with col1:
-            st.markdown(
-                f"### {i+1}. {person['name']} ({person['source'].title()})\n"
-                f"🕒 Wait: {max(0, wait_mins)} mins  \n"
-                f"📅 Est: {person['start'].strftime('%H:%M')} – {end.strftime('%H:%M')}"
+# --- Queue Display (a fragment: refreshes on its own without rerunning the page) ---
+QUEUE_REFRESH_SECONDS = 10
+
+
+@st.fragment(run_every=QUEUE_REFRESH_SECONDS)
+def current_queue():
+    with fragment_rerun("admin.queue"):
+        st.subheader("📋 Current Queue")
+
+        # Computed once per change and shared with every other screen showing this barber
+        now = datetime.now(ZoneInfo("Europe/London"))
+        view = get_live_queue(barber_id, avg_cut_duration).view(
+            max(now, now.replace(hour=open_hour, minute=0, second=0, microsecond=0))
+        )
+        walkins, bookings, queue_sorted = view.walkins, view.bookings, view.queue
+        if view.stale:
+            st.warning("⚠️ The live queue is delayed. Showing the last known queue.")
+
+        # --- Display Queue ---
+        if queue_sorted:
+            for i, person in enumerate(queue_sorted):
+                wait_mins = int((person["start"] - now).total_seconds() / 60)
+                end = person["start"] + timedelta(minutes=avg_cut_duration)
+
+                col1, col2 = st.columns([5, 1])
+                with col1:
+                    st.markdown(
+                        f"### {i+1}. {person['name']} ({person['source'].title()})\n"
+                        f"🕒 Wait: {max(0, wait_mins)} mins  \n"
+                        f"📅 Est: {person['start'].strftime('%H:%M')} – {end.strftime('%H:%M')}"
+                    )
+                with col2:
+                    if st.button("✅ Done", key=f"done_{person['key']}"):
+                        with span("queue.complete"):
+                            complete_queue_entries(barber_id, [person], walkins, bookings, now, settings=config)
+                        get_feed(barber_id).apply_local(f"{person['source']}s", person["key"], None)
+                        rerun_fragment()
+
+            # --- Complete several at once (one write) ---
+            positions = {person["key"]: i + 1 for i, person in enumerate(queue_sorted)}
+            by_key = {person["key"]: person for person in queue_sorted}
+            selected = st.multiselect(
+                "Select people who have been served:",
+                options=list(by_key),
+                format_func=lambda key: f"{positions[key]}. {by_key[key]['name']} ({by_key[key]['source'].title()})",
+                key=f"served_{barber_id}",
             )
-        with col2:
-            if st.button("✅ Done", key=f"remove_{i}"):
-                ref_to_edit = walkin_ref if person["source"] == "walkin" else booking_ref
-                entries = walkins if person["source"] == "walkin" else bookings
-
-                for key, entry in entries.items():
-                    if entry.get("name") == person["name"]:
-                        if person["source"] == "booking":
-                            if entry.get("slot") != person["start"].isoformat():
-                                continue
-                        ref_to_edit.child(key).delete()
-                        break
-                st.rerun()
-else:
-    st.info("No one is in the queue yet.")
+            if st.button("✅ Complete Selected", disabled=not selected):
+                chosen = [by_key[key] for key in selected]
+                with span("queue.complete"):
+                    complete_queue_entries(barber_id, chosen, walkins, bookings, now, settings=config)
+                feed = get_feed(barber_id)
+                for person in chosen:
+                    feed.apply_local(f"{person['source']}s", person["key"], None)
+                del st.session_state[f"served_{barber_id}"]
+                rerun_fragment()
+        else:
+            st.info("No one is in the queue yet.")
+
+        # --- Offline sync (joins, completions and bookings saved locally until the database has them) ---
+        journal = get_journal()
+        waiting = journal.pending(barber_id)
+        if waiting:
+            st.caption(f"🔄 {len(waiting)} change(s) saved on this device, waiting to reach the database.")
+        for op in journal.conflicts(barber_id):
+            if op["kind"] == "booking":
+                booking = op["payload"]["booking"]
+                what = f"Booking for {booking.get('name')} ({booking.get('phone_local', '')}) at {booking.get('slot', '')[:16]}"
+            else:
+                what = f"Queue change from {op['created_at'][:16].replace('T', ' ')}"
+            conflict_col, dismiss_col = st.columns([5, 1])
+            with conflict_col:
+                st.warning(f"⚠️ {what}: {op['error']}")
+            with dismiss_col:
+                if st.button("Dismiss", key=f"dismiss_{op['id']}"):
+                    journal.dismiss(op["id"])
+                    rerun_fragment()
+
+
+current_queue()
 
 # --- Export CSV ---
 st.divider()
 st.subheader("📁 Export Logs")
 
-if st.button("⬇️ Export Today's Log as CSV"):
-    try:
-        date_today = now.strftime("%Y-%m-%d")
-        log_ref = db.reference(f"logs/{date_today}")
-        logs = log_ref.get()
-
-        if logs:
-            df = pd.DataFrame.from_dict(logs, orient="index")
-            df["joined_at"] = pd.to_datetime(df["joined_at"])
-            df = df.sort_values("joined_at")
-            df["joined_at"] = df["joined_at"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-            buffer = StringIO()
-            df.to_csv(buffer, index=False)
-            st.download_button(
-                label="📥 Download CSV",
-                data=buffer.getvalue(),
-                file_name=f"queue_log_{barber_id}_{date_today}.csv",
-                mime="text/csv"
-            )
-        else:
-            st.info("ℹ️ No logs found for today.")
-    except Exception as e:
-        st.error(f"⚠️ Failed to export logs: {e}")
+export_col1, export_col2 = st.columns(2)
+with export_col1:
+    export_range = st.date_input(
+        "Date range:", value=(now.date(), now.date()), max_value=now.date(), key=f"export_range_{barber_id}"
+    )
+with export_col2:
+    export_format = st.radio("Format:", list(FORMATS), horizontal=True, key=f"export_format_{barber_id}")
+
+if st.button("⬇️ Export Logs"):
+    if len(export_range) != 2:
+        st.warning("Pick a start and an end date.")
+    else:
+        start_day, end_day = export_range
+        try:
+            with span("export.logs"):
+                export_file = export_logs(barber_id, start_day, end_day, export_format)
+            if export_file is None:
+                st.info("ℹ️ No logs found for those dates.")
+            else:
+                extension, mime = FORMATS[export_format]
+                st.download_button(
+                    label="📥 Download",
+                    data=export_file,
+                    file_name=f"queue_log_{barber_id}_{start_day}_{end_day}.{extension}",
+                    mime=mime
+                )
+        except Exception as e:
+            st.error(f"⚠️ Failed to export logs: {e}")
 
 
 # --- Calendar View ---
@@ -185,8 +184,35 @@ st.subheader("📅 Booking Calendar")
 is_admin = st.session_state.get(f"is_admin_{barber_id}", False)
 
 if is_admin:
-    # Fetch bookings
-    raw_bookings = booking_ref.get() or {}
+    # Prev/Today/Next move the picked date, so only the week (or month) on show is fetched
+    week_key = f"calendar_week_{barber_id}"
+    view_key = f"calendar_view_{barber_id}"
+    st.session_state.setdefault(week_key, now.date())
+
+    def shift_calendar(step: int) -> None:
+        picked = st.session_state[week_key]
+        if step == 0:
+            picked = now.date()
+        elif st.session_state.get(view_key) == "Month":
+            picked = (picked.replace(day=1) + timedelta(days=32 if step > 0 else -1)).replace(day=1)
+        else:
+            picked += timedelta(weeks=step)
+        st.session_state[week_key] = picked
+
+    prev_col, today_col, next_col, pick_col, view_col = st.columns([1, 1, 1, 3, 2])
+    prev_col.button("◀ Prev", on_click=shift_calendar, args=(-1,), key=f"calendar_prev_{barber_id}")
+    today_col.button("Today", on_click=shift_calendar, args=(0,), key=f"calendar_today_{barber_id}")
+    next_col.button("Next ▶", on_click=shift_calendar, args=(1,), key=f"calendar_next_{barber_id}")
+    picked = pick_col.date_input("Show week of:", key=week_key)
+    month_view = view_col.radio("View:", ["Week", "Month"], horizontal=True, key=view_key) == "Month"
+
+    if month_view:
+        week_start = picked.replace(day=1)
+        week_end = (week_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        week_start = picked - timedelta(days=picked.weekday())
+        week_end = week_start + timedelta(days=6)
+    raw_bookings = get_bookings_between(barber_id, week_start, week_end)
 
     # st.json(raw_bookings) "this is for seeing the JSON info of the people booking"
 
@@ -215,12 +241,17 @@ if is_admin:
 
     # Render with streamlit-calendar
     calendar_options = {
-        "initialView": "timeGridWeek",
+        "initialView": "dayGridMonth" if month_view else "timeGridWeek",
+        "initialDate": week_start.isoformat(),
         "timeZone": "Europe/London",
         "headerToolbar": {
-            "left": "prev,next today",
+            "left": "",  # navigation is the Prev/Today/Next buttons above
             "center": "title",
-            "right": "timeGridDay,timeGridWeek,dayGridMonth",
+            "right": "" if month_view else "timeGridDay,timeGridWeek",
+        },
+        "validRange": {
+            "start": week_start.isoformat(),
+            "end": (week_end + timedelta(days=1)).isoformat(),
         },
         "slotMinTime": "08:00:00",
         "slotMaxTime": "22:00:00",
@@ -228,10 +259,48 @@ if is_admin:
         "nowIndicator": True,
     }
 
-    selected_event = calendar(events=events, options=calendar_options)
+    with span("render.calendar"):
+        selected_event = calendar(events=events, options=calendar_options)
 
     if selected_event:
         st.info(f"📌 You clicked: {selected_event.get('title')}")
 else:
     st.info("Log in with the correct PIN to see the calendar.")
 
+# --- Shop Settings ---
+st.divider()
+with st.expander("⚙️ Shop Settings"):
+    with st.form(f"settings_{barber_id}"):
+        shop_name = st.text_input("🏪 Shop Name", value=config.get("shop_name", ""))
+        logo_url = st.text_input("🖼️ Logo URL", value=config.get("logo_url", ""))
+        new_cut_duration = st.number_input("⏱️ Average Cut Duration (mins)", 5, 120, avg_cut_duration)
+        hours_col1, hours_col2 = st.columns(2)
+        new_open_hour = hours_col1.number_input("🕙 Opening Hour", 0, 23, open_hour)
+        new_close_hour = hours_col2.number_input("🕙 Closing Hour", 1, 24, int(config.get("close_hour", 22)))
+        saved = st.form_submit_button("💾 Save Settings")
+
+    if saved:
+        wanted = {
+            "shop_name": shop_name.strip(),
+            "logo_url": logo_url.strip(),
+            "avg_cut_duration": int(new_cut_duration),
+            "open_hour": int(new_open_hour),
+            "close_hour": int(new_close_hour),
+        }
+        changed = {field: value for field, value in wanted.items() if config.get(field) != value}
+        if wanted["close_hour"] <= wanted["open_hour"]:
+            st.error("❌ Closing hour must be after opening hour.")
+        elif changed:
+            update_barber_settings(barber_id, changed)
+            st.rerun()  # redraw the queue and calendar with the new hours
+        else:
+            st.info("ℹ️ Nothing changed.")
+
+# --- Diagnostics (admins only: past the PIN check above) ---
+st.divider()
+with st.expander("🩺 Diagnostics"):
+    render_diagnostics()
+
+finish_rerun()
+
+
@@ -1,14 +1,15 @@
 import streamlit as st
-import json
 import re
-import firebase_admin
-from firebase_admin import credentials, db
-from datetime import datetime, timedelta
+from datetime import datetime
 from zoneinfo import ZoneInfo
-from streamlit_autorefresh import st_autorefresh
 
-from utils.firebase_utils import get_barber_config
+from utils.availability import availability_grid, load_day
+from utils.bookings import SlotTakenError, queue_booking, reserve_booking
+from utils.instrumentation import finish_rerun, span, start_rerun
+from utils.live import get_feed
 from utils.session import get_barber_id
+from utils.snapshot import load_barber_snapshot
+from utils.storage import StorageUnavailable, new_push_key
 
 barber_id = get_barber_id()
 
@@ -30,22 +31,12 @@ def to_e164_uk(phone: str) -> str:
     return p  # fallback (won't pass validation if wrong)
 
 
-# --- Firebase init ---
-if not firebase_admin._apps:
-    cred = credentials.Certificate(json.loads(st.secrets["firebase_creds"]))
-    firebase_admin.initialize_app(cred, {'databaseURL': st.secrets["firebase_db_url"]})
-
-# Load the barber config
-config = get_barber_config(barber_id)
-
-# Firebase References (barber-specific)
-walkin_ref = db.reference(f"barbers/{barber_id}/walkins")
-booking_ref = db.reference(f"barbers/{barber_id}/bookings")
-settings_ref = db.reference(f"barbers/{barber_id}/settings")
+start_rerun("booking")
 
 # --- Page Setup ---
 st.set_page_config(page_title="Book Appointment", layout="centered")
-settings = settings_ref.get() or {}
+snapshot = load_barber_snapshot(barber_id, parts=("settings",))  # one (cached) settings read
+settings = snapshot.settings
 avg_cut_duration = int(settings.get("avg_cut_duration", 25))
 open_hour = int(settings.get("open_hour", 10))
 close_hour = int(settings.get("close_hour", 22))
@@ -62,85 +53,72 @@ if "booking_confirmation" in st.session_state:
     booking = st.session_state["booking_confirmation"]
     dt = datetime.fromisoformat(booking["datetime"]).astimezone(ZoneInfo("Europe/London"))
     formatted_dt = dt.strftime("%A %d %B at %I:%M %p")
-    st.success(f"✅ {booking['name']}, your booking is confirmed for {formatted_dt}.")
+    if booking.get("pending"):
+        st.info(
+            f"📨 {booking['name']}, we've received your booking for {formatted_dt} and will confirm it "
+            "shortly. If the slot went just before, the shop will contact you on your mobile."
+        )
+    else:
+        st.success(f"✅ {booking['name']}, your booking is confirmed for {formatted_dt}.")
 
 # --- Timezone & Date Setup ---
 tz = ZoneInfo("Europe/London")
 now = datetime.now(tz).replace(second=0, microsecond=0)
 today = now.date()
 
+# --- Availability at a glance (one range read, one vectorised pass over all days) ---
+st.subheader("📆 Availability at a Glance")
+horizon = st.radio("Show the next:", [7, 14], format_func=lambda d: f"{d} days", horizontal=True)
+with span("availability.grid"):
+    ahead = availability_grid(barber_id, today, horizon, settings, now)
+earliest = ahead.first_free()
+
+
+def jump_to_earliest():
+    st.session_state["booking_date"] = earliest[0]
+    st.session_state["jump_time"] = earliest[1].strftime('%H:%M')
+
+
+if earliest:
+    st.caption(f"⏭️ Earliest free slot: **{earliest[1].strftime('%A %d %B at %H:%M')}**")
+    st.button("Jump to earliest free slot", on_click=jump_to_earliest)
+else:
+    st.info(f"🕒 Fully booked for the next {horizon} days.")
+
+st.dataframe(
+    [
+        {"Day": day.strftime("%a %d %b"), "Free slots": int(count), "First free": first.strftime('%H:%M') if first else "—"}
+        for day, count, first in zip(ahead.days, ahead.free_counts(), ahead.first_free_per_day())
+    ],
+    hide_index=True,
+    width="stretch",
+)
+
 st.subheader("🗓️ Select Date for Booking")
-selected_date = st.date_input("Pick a date:", min_value=today)
+selected_date = st.date_input("Pick a date:", min_value=today, key="booking_date")
 
 # --- Continue if date selected ---
 if selected_date:
-    open_time = datetime.combine(selected_date, datetime.min.time(), tzinfo=tz).replace(hour=open_hour)
-    close_time = datetime.combine(selected_date, datetime.min.time(), tzinfo=tz).replace(hour=close_hour)
-
-    walkins = walkin_ref.get() or {}
-    bookings = booking_ref.get() or {}
-
-    sorted_walkins = sorted(
-        [(k, v) for k, v in walkins.items() if "joined_at" in v],
-        key=lambda x: x[1]["joined_at"]
-    )
-    sorted_bookings = sorted(
-        [(k, v) for k, v in bookings.items() if "slot" in v],
-        key=lambda x: x[1]["slot"]
-    )
-
-    # --- Generate blocked time ranges ---
-    blocked_slots = []
-
-    # Block walk-ins (only if date is today)
-    if selected_date == today:
-        walkin_queue = [
-            datetime.fromisoformat(v["joined_at"]).replace(tzinfo=tz)
-            for _, v in sorted_walkins
-            if "joined_at" in v and datetime.fromisoformat(v["joined_at"]).date() == today
-        ]
-        walkin_start = max(open_time, now)
-        for _ in walkin_queue:
-            blocked_slots.append((walkin_start, walkin_start + timedelta(minutes=avg_cut_duration)))
-            walkin_start += timedelta(minutes=avg_cut_duration)
-
-    # Block existing bookings
-    for _, b in sorted_bookings:
-        try:
-            slot_dt = datetime.fromisoformat(b["slot"])
-            if slot_dt.tzinfo is None:
-                slot_dt = slot_dt.replace(tzinfo=tz)
-        except Exception:
-            continue
-        if slot_dt.date() == selected_date:
-            blocked_slots.append((slot_dt, slot_dt + timedelta(minutes=avg_cut_duration)))
-
     # --- Calculate available slots ---
-    available_slots = []
-    slot = open_time
-    while slot + timedelta(minutes=avg_cut_duration) <= close_time:
-        if selected_date == today and slot < now:
-            slot += timedelta(minutes=avg_cut_duration)
-            continue
-
-        overlap = any(
-            (bs <= slot < be) or (slot <= bs < slot + timedelta(minutes=avg_cut_duration))
-            for bs, be in blocked_slots
-        )
-
-        if not overlap:
-            available_slots.append(slot)
-
-        slot += timedelta(minutes=avg_cut_duration)
+    # Dates in the overview come straight from its matrix; later ones are one small read
+    row = ahead.row(selected_date)
+    with span("availability.day"):
+        if row is not None:
+            available_slots = ahead.free_slots(row)
+        else:
+            available_slots = load_day(barber_id, selected_date, settings).free_slots(now)
 
     # --- Booking Form ---
     if available_slots:
         with st.form("booking_form"):
             name = st.text_input("Enter your full name:")
             phone = st.text_input("Mobile number (UK, e.g. 07123456789)")
+            slot_labels = [s.strftime('%H:%M') for s in available_slots]
+            jump_time = st.session_state.pop("jump_time", None)
             chosen_slot_label = st.selectbox(
                 "Pick an available time:",
-                [s.strftime('%H:%M') for s in available_slots]
+                slot_labels,
+                index=slot_labels.index(jump_time) if jump_time in slot_labels else 0
             )
             submitted = st.form_submit_button("📥 Confirm Booking")
 
@@ -159,24 +137,12 @@ if selected_date:
             except StopIteration:
                 errors.append("Selected slot is no longer available. Please refresh and try again.")
 
-            # Duplicate booking check: same phone + slot
-            if not errors:
-                slot_iso = selected_time.isoformat()
-                existing = booking_ref.get() or {}
-                duplicate = False
-                for _, rec in (existing.items() if isinstance(existing, dict) else []):
-                    if rec.get("slot") == slot_iso and rec.get("phone_e164") == to_e164_uk(phone):
-                        duplicate = True
-                        break
-                if duplicate:
-                    errors.append("You already have a booking for this time with this phone number.")
-
             if errors:
                 for e in errors:
                     st.error(e)
             else:
                 # Save to Firebase
-                booking_ref.push({
+                booking = {
                     "name": name.strip().title(),
                     "phone_local": phone.strip(),
                     "phone_e164": to_e164_uk(phone),
@@ -184,12 +150,36 @@ if selected_date:
                     "created_at": now.isoformat(),  # tz-aware
                     "status": "confirmed",
                     "source": "self_service",
-                })
-
-                st.session_state["booking_confirmation"] = {
-                    "name": name.strip().title(),
-                    "datetime": selected_time.isoformat()
                 }
-                st.rerun()
+                # Claim the slot atomically; whoever commits first gets it. The key is fixed up
+                # front so a claim left by a timed-out attempt is this booking's own on replay
+                booking_key = new_push_key()
+                try:
+                    with span("booking.reserve"):
+                        reserve_booking(barber_id, booking, settings=settings, key=booking_key)
+                except SlotTakenError as e:
+                    if e.same_phone:
+                        st.error("You already have a booking for this time with this phone number.")
+                    else:
+                        st.error("⚠️ Sorry, that slot was just taken. Please pick another time.")
+                except StorageUnavailable:
+                    # Database unreachable: take the booking now, place it once it's back
+                    queue_booking(barber_id, booking, settings=settings, key=booking_key)
+                    st.session_state["booking_confirmation"] = {
+                        "name": name.strip().title(),
+                        "datetime": selected_time.isoformat(),
+                        "pending": True,
+                    }
+                    st.rerun()
+                else:
+                    get_feed(barber_id).apply_local("bookings", booking_key, booking)
+
+                    st.session_state["booking_confirmation"] = {
+                        "name": name.strip().title(),
+                        "datetime": selected_time.isoformat()
+                    }
+                    st.rerun()
     else:
-        st.info("🕒 No appointment slots available for this date.")
\ No newline at end of file
+        st.info("🕒 No appointment slots available for this date.")
+
+finish_rerun()
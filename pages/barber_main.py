@@ -1,8 +1,10 @@
 import streamlit as st
 from utils.firebase_utils import get_barber_config
+from utils.instrumentation import finish_rerun, start_rerun
 from utils.session import get_barber_id, set_barber_id
 
 st.set_page_config(page_title="Barber Portal", layout="centered")
+start_rerun("portal")
 
 # Retrieve the selected barber ID from session
 barber_id = get_barber_id()
@@ -68,3 +70,5 @@ with col2:
     if st.button("📅 Book Appointment"):
         set_barber_id(barber_id)        # ensure URL/session updated
         st.switch_page("pages/4_Book_Appointment.py")
+
+finish_rerun()
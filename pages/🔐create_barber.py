@@ -1,11 +1,12 @@
 import streamlit as st
-from firebase_admin import db
+from utils.firebase_utils import create_new_barber, rebuild_barber_index
+from utils.secrets import secret
 
 st.set_page_config(page_title="Create New Barber", layout="centered")
 st.title("🔐 Super Admin – Add New Barber")
 
 # --- Super Admin Access ---
-SUPER_ADMIN_PIN = st.secrets.get("super_admin_pin", "9999")
+SUPER_ADMIN_PIN = secret("super_admin_pin", "9999")
 
 if "super_admin_granted" not in st.session_state:
     st.session_state["super_admin_granted"] = False
@@ -47,31 +48,33 @@ if submitted:
     if not barber_id.strip():
         st.error("❌ Barber ID is required.")
     else:
-        barber_ref = db.reference(f"barbers/{barber_id}")
-        if barber_ref.get():
+        # Generate logo from initials if blank
+        if not logo_url.strip() and shop_name.strip():
+            initials = "".join(word[0].upper() for word in shop_name.strip().split())
+            logo_url = f"https://ui-avatars.com/api/?name={initials}&background=random"
+
+        # Push to Firebase (barber node + directory entry)
+        created = create_new_barber(
+            barber_id,
+            shop_name=shop_name or "New Barber",
+            admin_pin=admin_pin or "0000",
+            logo_url=logo_url,
+            avg_cut_duration=avg_duration,
+            open_hour=open_hour,
+            close_hour=close_hour,
+        )
+
+        if not created:
             st.warning(f"⚠️ Barber '{barber_id}' already exists.")
         else:
-            # Generate logo from initials if blank
-            if not logo_url.strip() and shop_name.strip():
-                initials = "".join(word[0].upper() for word in shop_name.strip().split())
-                logo_url = f"https://ui-avatars.com/api/?name={initials}&background=random"
+            st.success(f"✅ Barber '{barber_id}' created successfully!")
+            st.image(logo_url, caption="Logo preview", width=100)
 
-            # Push to Firebase
-            barber_ref.set({
-                "config": {
-                    "admin_pin": admin_pin or "0000"
-                },
-                "settings": {
-                    "avg_cut_duration": avg_duration,
-                    "open_hour": open_hour,
-                    "close_hour": close_hour,
-                    "shop_name": shop_name or "New Barber",
-                    "logo_url": logo_url
-                },
-                "walkins": {},
-                "bookings": {},
-                "logs": {}
-            })
+# --- Directory maintenance ---
+st.divider()
+st.subheader("📇 Barber Directory")
+st.caption("The landing page lists shops from a small index. Rebuild it if older shops are missing.")
 
-            st.success(f"✅ Barber '{barber_id}' created successfully!")
-            st.image(logo_url, caption="Logo preview", width=100)
\ No newline at end of file
+if st.button("🔄 Rebuild Directory Index"):
+    count = rebuild_barber_index()
+    st.success(f"✅ Indexed {count} barber shops.")
@@ -0,0 +1,95 @@
+# scripts/archive_logs.py
+"""
+Compact closed days of walk-in logs (`barbers/{id}/logs/{YYYY-MM-DD}`) into Parquet,
+one file per barber and month (see utils/archive.py).
+
+    python -m scripts.archive_logs <barber_id> [...] [--prune] [--dry-run] [--keep-markers 7]
+    python -m scripts.archive_logs --all
+
+Only days before today are archived, and days already in the archive are skipped, so
+the job can run nightly. Each month's rows are read back and counted before --prune
+deletes those days from Firebase.
+
+Each run also deletes the write journal's replay markers (`barbers/{id}/journal/{day}`,
+see utils/journal.py) older than --keep-markers days; they only matter while a write
+may still be retried.
+"""
+import argparse
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from utils.archive import archived_days, get_live_logs, logs_to_table, month_path, read_archive, write_month
+from utils.bookings import PARTITION_RE
+from utils.firebase_utils import get_all_barber_ids
+from utils.journal import prune_markers
+from utils.scheduling import LONDON
+from utils.storage import reference
+
+
+def closed_days(barber_id: str, today) -> dict:
+    """{YYYY-MM: [day, ...]} of log days before today that are not archived yet (shallow read)."""
+    days = reference(f"barbers/{barber_id}/logs").get(shallow=True) or {}
+    by_month = defaultdict(list)
+    for key in sorted(days):
+        if PARTITION_RE.fullmatch(key) and key < today.isoformat():
+            by_month[key[:7]].append(date.fromisoformat(key))
+    pending = {}
+    for month, month_days in by_month.items():
+        done = archived_days(barber_id, month)
+        pending[month] = [d for d in month_days if d not in done]
+    return pending
+
+
+def archive(barber_id: str, today, prune: bool = False, dry_run: bool = False) -> bool:
+    ok = True
+    for month, days in closed_days(barber_id, today).items():
+        if not days:
+            continue
+        logs = get_live_logs(barber_id, days[0], days[-1])
+        logs = {day: records for day, records in logs.items() if date.fromisoformat(day) in days}
+        table = logs_to_table(logs)
+        print(f"{barber_id} {month}: {len(days)} day(s), {table.num_rows} row(s)")
+        if dry_run:
+            continue
+
+        write_month(barber_id, month, table)
+        archived = read_archive(barber_id, days[0], days[-1], columns=["day"]).num_rows
+        if archived < table.num_rows:
+            print(f"❌ {month_path(barber_id, month)}: expected {table.num_rows} rows, found {archived}")
+            ok = False
+            continue
+        if prune:
+            reference(f"barbers/{barber_id}/logs").update({day: None for day in logs})
+    return ok
+
+
+def prune_journal_markers(barber_id: str, today, keep_days: int, dry_run: bool = False) -> None:
+    days = prune_markers(barber_id, today - timedelta(days=keep_days), dry_run=dry_run)
+    if days:
+        verb = "would delete" if dry_run else "deleted"
+        print(f"{barber_id}: {verb} journal markers for {len(days)} day(s), {days[0]} – {days[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("barber_ids", nargs="*")
+    parser.add_argument("--all", action="store_true", help="archive every barber in the directory")
+    parser.add_argument("--prune", action="store_true", help="delete archived days from Firebase")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be archived")
+    parser.add_argument("--keep-markers", type=int, default=7, help="days of journal replay markers to keep")
+    args = parser.parse_args()
+
+    barber_ids = get_all_barber_ids() if args.all else args.barber_ids
+    if not barber_ids:
+        parser.error("give at least one barber_id, or --all")
+
+    today = datetime.now(LONDON).date()
+    results = [archive(barber_id, today, args.prune, args.dry_run) for barber_id in barber_ids]
+    for barber_id in barber_ids:
+        prune_journal_markers(barber_id, today, args.keep_markers, args.dry_run)
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# scripts/backfill_rollups.py
+"""
+Rebuild a shop's dashboard counters (`barbers/{id}/stats`) from its raw history, for
+shops that were taking customers before the counters were maintained at write time.
+
+    python -m scripts.backfill_rollups <barber_id> [...]   # or --all
+
+Walk-ins are counted from the daily logs (archived days are read from Parquet, see
+utils/archive.py) and `walkins_log`, bookings from `bookings_log`
+and the booking partitions; records seen in more than one place are counted once.
+The counters are replaced in one write, so run it while the shop is quiet.
+"""
+import argparse
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from utils.archive import first_log_day, load_logs
+from utils.bookings import PARTITION_RE
+from utils.firebase_utils import get_all_barber_ids
+from utils.rollups import weekday_hour_key
+from utils.scheduling import LONDON, parse_time
+from utils.storage import reference
+
+
+def _records(node) -> list:
+    if isinstance(node, dict):
+        return [r for r in node.values() if isinstance(r, dict)]
+    if isinstance(node, list):
+        return [r for r in node if isinstance(r, dict)]
+    return []
+
+
+def collect(barber_id: str) -> list:
+    """[(moment, source)] for every distinct walk-in and booking in the shop's history."""
+    base = reference(f"barbers/{barber_id}")
+    seen = set()
+    events = []
+
+    def add(moment, name, source):
+        if moment is not None and (source, name, moment) not in seen:
+            seen.add((source, name, moment))
+            events.append((moment, source))
+
+    first_day = first_log_day(barber_id)
+    if first_day is not None:
+        logs = load_logs(barber_id, first_day, datetime.now(LONDON).date(), columns=["name", "joined_at"])
+        for name, joined_at in zip(logs["name"], logs["joined_at"]):
+            if pd.notna(joined_at):
+                add(joined_at.to_pydatetime(), name, "walkin")
+    for record in _records(base.child("walkins_log").get()):
+        add(parse_time(record.get("joined_at")), record.get("name"), "walkin")
+    for record in _records(base.child("bookings_log").get()):
+        add(parse_time(record.get("slot")), record.get("name"), "booking")
+    for key, partition in (base.child("bookings").get() or {}).items():
+        for record in (_records(partition) if PARTITION_RE.fullmatch(key) else _records({key: partition})):
+            add(parse_time(record.get("slot")), record.get("name"), "booking")
+    return events
+
+
+def build_stats(events: list) -> dict:
+    daily, weekday_hour, totals = Counter(), Counter(), Counter()
+    for moment, source in events:
+        daily[(moment.date().isoformat(), source)] += 1
+        weekday_hour[(weekday_hour_key(moment), source)] += 1
+        totals[source] += 1
+
+    stats = {"daily": {}, "weekday_hour": {}, "totals": dict(totals)}
+    for (day, source), count in daily.items():
+        stats["daily"].setdefault(day, {})[source] = count
+    for (key, source), count in weekday_hour.items():
+        stats["weekday_hour"].setdefault(key, {})[source] = count
+    return stats
+
+
+def backfill(barber_id: str) -> None:
+    stats = build_stats(collect(barber_id))
+    version = int(reference(f"barbers/{barber_id}/stats/version").get() or 0)
+    reference(f"barbers/{barber_id}/stats").set({**stats, "version": version + 1})
+    print(f"✅ {barber_id}: {stats['totals']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("barber_ids", nargs="*")
+    parser.add_argument("--all", action="store_true")
+    args = parser.parse_args()
+
+    barber_ids = get_all_barber_ids() if args.all else args.barber_ids
+    if not barber_ids:
+        parser.error("give at least one barber_id, or --all")
+    for barber_id in barber_ids:
+        backfill(barber_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# scripts/migrate_bookings.py
+"""
+Move a shop's flat `bookings/{push_key}` records into day partitions
+(`bookings/{YYYY-MM-DD}/{push_key}`) while the app keeps running.
+
+    python -m scripts.migrate_bookings <barber_id> [--batch 200] [--dry-run]
+    python -m scripts.migrate_bookings --all
+
+Each batch is one atomic multi-path update that writes the partitioned copies,
+deletes the flat originals and records progress under
+`barbers/{id}/migrations/bookings_by_date`, so the command can be stopped and rerun
+at any point. Records without a usable slot go to `bookings_unscheduled/{key}`.
+At the end the partition counts are checked before the shop is marked done.
+"""
+import argparse
+import sys
+
+from utils.bookings import MIGRATION, PARTITION_RE, booking_day, bookings_ref
+from utils.firebase_utils import get_all_barber_ids
+from utils.storage import reference
+
+
+def count_bookings(barber_id: str) -> tuple:
+    """(flat records left, records in day partitions), using shallow reads only."""
+    children = bookings_ref(barber_id).get(shallow=True) or {}
+    flat = sum(1 for key in children if not PARTITION_RE.fullmatch(key))
+    partitioned = sum(
+        len(bookings_ref(barber_id, day).get(shallow=True) or {})
+        for day in children if PARTITION_RE.fullmatch(day)
+    )
+    return flat, partitioned
+
+
+def migrate(barber_id: str, batch: int = 200, dry_run: bool = False) -> bool:
+    state_ref = reference(f"barbers/{barber_id}/migrations/{MIGRATION}")
+    state = state_ref.get() or {}
+    if state.get("done"):
+        print(f"✅ {barber_id}: already migrated.")
+        return True
+
+    flat_before, partitioned_before = count_bookings(barber_id)
+    unscheduled_before = len(reference(f"barbers/{barber_id}/bookings_unscheduled").get(shallow=True) or {})
+    print(f"🔎 {barber_id}: {flat_before} flat, {partitioned_before} partitioned.")
+    if dry_run:
+        return False
+
+    moved = unscheduled = 0
+    while True:
+        # Push keys start with '-', so this never returns the date partitions
+        chunk = (
+            bookings_ref(barber_id).order_by_key().start_at("-").end_at("-\uf8ff")
+            .limit_to_first(batch).get()
+        ) or {}
+        if not chunk:
+            break
+
+        paths = {}
+        for key, booking in chunk.items():
+            paths[f"barbers/{barber_id}/bookings/{key}"] = None
+            try:
+                day = booking_day(booking.get("slot"))
+                paths[f"barbers/{barber_id}/bookings/{day}/{key}"] = booking
+                moved += 1
+            except (AttributeError, ValueError):
+                paths[f"barbers/{barber_id}/bookings_unscheduled/{key}"] = booking
+                unscheduled += 1
+
+        paths[f"barbers/{barber_id}/migrations/{MIGRATION}/moved"] = (state.get("moved", 0) + moved)
+        paths[f"barbers/{barber_id}/migrations/{MIGRATION}/last_key"] = max(chunk)
+        reference().update(paths)
+        print(f"   … moved {moved}, unscheduled {unscheduled}")
+
+    flat_after, partitioned_after = count_bookings(barber_id)
+    unscheduled_after = len(reference(f"barbers/{barber_id}/bookings_unscheduled").get(shallow=True) or {})
+    # New bookings may land in partitions while we run, so partitions can only have grown by at least `moved`
+    ok = (
+        flat_after == 0
+        and partitioned_after >= partitioned_before + moved
+        and unscheduled_after == unscheduled_before + unscheduled
+    )
+    if not ok:
+        print(f"❌ {barber_id}: verification failed "
+              f"(flat left {flat_after}, partitioned {partitioned_before} → {partitioned_after}, moved {moved}).")
+        return False
+
+    state_ref.update({"done": True})
+    print(f"✅ {barber_id}: {moved} moved, {unscheduled} without a slot, {partitioned_after} partitioned in total.")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("barber_ids", nargs="*")
+    parser.add_argument("--all", action="store_true", help="migrate every barber in the directory")
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="only report counts")
+    args = parser.parse_args()
+
+    barber_ids = get_all_barber_ids() if args.all else args.barber_ids
+    if not barber_ids:
+        parser.error("give at least one barber_id, or --all")
+
+    results = [migrate(barber_id, args.batch, args.dry_run) for barber_id in barber_ids]
+    sys.exit(0 if all(results) or args.dry_run else 1)
+
+
+if __name__ == "__main__":
+    main()
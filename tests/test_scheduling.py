@@ -0,0 +1,64 @@
+# tests/test_scheduling.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.scheduling import LONDON, BarberSchedule
+
+OPEN = datetime(2025, 5, 3, 10, 0, tzinfo=LONDON)
+
+
+def at(minutes: int) -> str:
+    return (OPEN + timedelta(minutes=minutes)).isoformat()
+
+
+def build(walkins: dict, bookings: dict) -> BarberSchedule:
+    schedule = BarberSchedule(20)
+    schedule.sync(walkins, bookings)
+    schedule.set_start(OPEN)
+    return schedule
+
+
+def starts(schedule: BarberSchedule) -> list:
+    return [(person["key"], person["start"]) for person in schedule.queue()]
+
+
+@pytest.fixture
+def day():
+    walkins = {f"w{i}": {"name": f"W{i}", "joined_at": at(-30 + i)} for i in range(4)}
+    bookings = {"b1": {"name": "B1", "slot": at(20)}, "b2": {"name": "B2", "slot": at(100)}}
+    return walkins, bookings
+
+
+def test_reposition_walkin_matches_fresh_build(day):
+    walkins, bookings = day
+    schedule = build(walkins, bookings)
+    schedule.walkin_starts()  # ETAs placed, so the move has to invalidate them
+
+    position, start = schedule.reposition("w3", joined_at=at(-60))
+
+    moved = {**walkins, "w3": {**walkins["w3"], "joined_at": at(-60)}}
+    assert starts(schedule) == starts(build(moved, bookings))
+    assert (position, start) == (1, OPEN)
+
+
+def test_reposition_booking_matches_fresh_build(day):
+    walkins, bookings = day
+    schedule = build(walkins, bookings)
+    schedule.walkin_starts()
+
+    position, start = schedule.reposition("b2", slot=at(0))
+
+    moved = {**bookings, "b2": {**bookings["b2"], "slot": at(0)}}
+    assert starts(schedule) == starts(build(walkins, moved))
+    assert (position, start) == (1, OPEN)
+
+
+def test_reposition_needs_the_matching_field_and_a_known_key(day):
+    schedule = build(*day)
+    with pytest.raises(ValueError):
+        schedule.reposition("w0", slot=at(0))
+    with pytest.raises(ValueError):
+        schedule.reposition("b1", joined_at=at(0))
+    with pytest.raises(KeyError):
+        schedule.reposition("missing", joined_at=at(0))
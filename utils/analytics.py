@@ -0,0 +1,97 @@
+# utils/analytics.py
+"""
+Dashboard data pipeline: the rollup counters are turned into columnar frames (pre-sized
+arrays, explicit date parsing, categorical columns) and into one weekday x hour matrix,
+and the resulting figures are cached per stats version so repeat viewers skip the work.
+"""
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from utils.rollups import DAYS, SOURCES, load_stats
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+SOURCE_LABELS = {"walkin": "Walk-ins", "booking": "Bookings"}
+_DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+
+
+def daily_frame(daily: dict) -> pd.DataFrame:
+    """Long frame with one row per (date, source): date, source (categorical), people."""
+    dates = sorted(daily)
+    counts = np.zeros((len(dates), len(SOURCES)), dtype=np.int64)
+    for i, day in enumerate(dates):
+        row = daily[day] or {}
+        counts[i] = [row.get(source, 0) for source in SOURCES]
+
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates, format="%Y-%m-%d").repeat(len(SOURCES)),
+        "source": pd.Categorical.from_codes(np.tile(np.arange(len(SOURCES)), len(dates)), categories=SOURCES),
+        "people": counts.ravel(),
+    })
+
+
+def weekday_hour_matrix(weekday_hour: dict) -> np.ndarray:
+    """People per [source, weekday, hour] from the `Mon_10`-keyed counters, in one pass (bad keys skipped)."""
+    matrix = np.zeros((len(SOURCES), 7, 24), dtype=np.int64)
+    for key, counts in weekday_hour.items():
+        day_name, _, hour = str(key).partition("_")
+        day = _DAY_INDEX.get(day_name)
+        if day is None or not hour.isdigit() or int(hour) > 23 or not isinstance(counts, dict):
+            continue
+        matrix[:, day, int(hour)] = [counts.get(source, 0) for source in SOURCES]
+    return matrix
+
+
+def daily_figure(frame: pd.DataFrame):
+    fig = px.bar(
+        frame,
+        x="date",
+        y="people",
+        color="source",
+        title="Bookings vs Walk-ins per Day",
+        labels={"people": "Number of People", "date": "Date", "source": "Type"},
+        barmode="stack",
+    )
+    fig.for_each_trace(lambda t: t.update(name=SOURCE_LABELS.get(t.name, t.name)))
+    fig.update_layout(xaxis_title="Date", yaxis_title="People", legend_title="Type")
+    return fig
+
+
+def weekday_hour_figure(matrix: np.ndarray, open_hour: int, close_hour: int):
+    """One faceted heatmap (walk-ins | bookings) of people per weekday and opening hour."""
+    open_hour, close_hour = max(0, open_hour), min(24, close_hour)
+    if open_hour >= close_hour:
+        open_hour, close_hour = 0, 24  # hours not set up properly: show the whole day
+    hours = list(range(open_hour, close_hour))
+    fig = px.imshow(
+        matrix[:, :, open_hour:close_hour],
+        facet_col=0,
+        x=hours,
+        y=list(DAY_NAMES),
+        labels={"x": "Hour", "y": "Day", "color": "People"},
+        color_continuous_scale="Blues",
+        aspect="auto",
+    )
+    fig.for_each_annotation(
+        lambda a: a.update(text=SOURCE_LABELS[SOURCES[int(a.text.split("=")[-1])]])
+    )
+    fig.update_xaxes(dtick=1)
+    return fig
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def dashboard_figures(barber_id: str, version: int, open_hour: int, close_hour: int) -> dict:
+    """
+    Totals and figures for one shop. `version` is the stats version stamp: it isn't used
+    here, but it is part of the cache key, so any new walk-in or booking rebuilds.
+    """
+    stats = load_stats(barber_id)
+    totals = {source: int((stats.get("totals") or {}).get(source, 0)) for source in SOURCES}
+    return {
+        "totals": totals,
+        "daily": daily_figure(daily_frame(stats.get("daily") or {})),
+        "weekday_hour": weekday_hour_figure(
+            weekday_hour_matrix(stats.get("weekday_hour") or {}), open_hour, close_hour
+        ),
+    }
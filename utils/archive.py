@@ -0,0 +1,172 @@
+# utils/archive.py
+"""
+Closed days of walk-in logs, compacted out of Firebase into local Parquet files.
+
+    {archive_dir}/{barber_id}/{YYYY-MM}.parquet
+        day (date32), key (string), name (string), joined_at (timestamp, Europe/London)
+
+A day's log never changes once the day is over, so `scripts/archive_logs.py` moves
+closed days here and readers only ask Firebase for the days after the archive ends.
+Reads are memory-mapped and fetch only the columns and row groups they need.
+"""
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from utils.scheduling import LONDON
+from utils.secrets import secret
+from utils.storage import reference
+
+SCHEMA = pa.schema([
+    ("day", pa.date32()),
+    ("key", pa.string()),
+    ("name", pa.string()),
+    ("joined_at", pa.timestamp("us", tz="Europe/London")),
+])
+
+
+def archive_root() -> Path:
+    return Path(secret("archive_dir", "archive"))
+
+
+def month_path(barber_id: str, month: str) -> Path:
+    return archive_root() / barber_id / f"{month}.parquet"
+
+
+def _months(start_date, end_date) -> list:
+    months, cursor = [], start_date.replace(day=1)
+    while cursor <= end_date:
+        months.append(cursor.strftime("%Y-%m"))
+        cursor = (cursor + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def logs_to_table(logs_by_day: dict) -> pa.Table:
+    """Arrow table from Firebase-shaped logs: {YYYY-MM-DD: {push_key: {name, joined_at}}}."""
+    days, keys, names, joined = [], [], [], []
+    for day, records in sorted(logs_by_day.items()):
+        for key, record in (records or {}).items():
+            if isinstance(record, dict):
+                days.append(day)
+                keys.append(key)
+                names.append(record.get("name", ""))
+                joined.append(record.get("joined_at"))
+
+    return pa.table({
+        "day": pa.array(pd.to_datetime(pd.Series(days, dtype="string"), format="%Y-%m-%d").dt.date, pa.date32()),
+        "key": pa.array(keys, pa.string()),
+        "name": pa.array(names, pa.string()),
+        "joined_at": pa.array(_london_times(joined), SCHEMA.field("joined_at").type),
+    }, schema=SCHEMA)
+
+
+def _london_times(values: list) -> pd.Series:
+    """
+    ISO timestamps as Europe/London times. Like parse_time(), values without an offset
+    are shop-local (not UTC); anything unparseable becomes NaT.
+    """
+    text = pd.Series(values, dtype="string")
+    aware = text.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", na=False).to_numpy()
+    out = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns, Europe/London]")
+    if aware.any():
+        out[aware] = pd.to_datetime(text[aware], format="ISO8601", utc=True, errors="coerce").dt.tz_convert(LONDON)
+    if (~aware).any():
+        naive = pd.to_datetime(text[~aware], format="ISO8601", errors="coerce")
+        out[~aware] = naive.dt.tz_localize(LONDON, ambiguous=True, nonexistent="shift_forward")
+    return out
+
+
+def read_archive(barber_id: str, start_date, end_date, columns=None) -> pa.Table:
+    """Archived rows for start_date..end_date (inclusive), only the requested columns."""
+    wanted = list(columns or SCHEMA.names)
+    scan_columns = wanted if "day" in wanted else wanted + ["day"]
+    tables = []
+    for month in _months(start_date, end_date):
+        path = month_path(barber_id, month)
+        if path.exists():
+            tables.append(pq.read_table(
+                path,
+                columns=scan_columns,
+                memory_map=True,
+                filters=[("day", ">=", start_date), ("day", "<=", end_date)],
+            ))
+    if not tables:
+        return SCHEMA.empty_table().select(wanted)
+    return pa.concat_tables(tables).select(wanted)
+
+
+def archived_days(barber_id: str, month: str) -> set:
+    """Days already in a month's file (reads just the `day` column)."""
+    path = month_path(barber_id, month)
+    if not path.exists():
+        return set()
+    days = pq.read_table(path, columns=["day"], memory_map=True).column("day")
+    return set(pc.unique(days).to_pylist())
+
+
+def last_archived_day(barber_id: str):
+    """Latest archived day for the barber, or None if nothing has been archived yet."""
+    files = sorted((archive_root() / barber_id).glob("*.parquet"))
+    if not files:
+        return None
+    return pc.max(pq.read_table(files[-1], columns=["day"], memory_map=True).column("day")).as_py()
+
+
+def first_log_day(barber_id: str):
+    """Earliest day with a log, archived or still in Firebase (None if there are none)."""
+    files = sorted((archive_root() / barber_id).glob("*.parquet"))
+    if files:
+        return pc.min(pq.read_table(files[0], columns=["day"], memory_map=True).column("day")).as_py()
+    first = reference(f"barbers/{barber_id}/logs").order_by_key().limit_to_first(1).get() or {}
+    return min((date.fromisoformat(day) for day in first), default=None)
+
+
+def write_month(barber_id: str, month: str, table: pa.Table) -> None:
+    """Add days to a month's file. Rewritten via a temp file, so readers never see half a file."""
+    path = month_path(barber_id, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        existing = pq.read_table(path, memory_map=True)
+        new_days = pc.unique(table.column("day"))
+        existing = existing.filter(pc.invert(pc.is_in(existing.column("day"), value_set=new_days)))
+        table = pa.concat_tables([existing, table])
+    table = table.sort_by([("day", "ascending"), ("joined_at", "ascending")])
+
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    tmp.replace(path)
+
+
+def get_live_logs(barber_id: str, start_date, end_date) -> dict:
+    """Logs still in Firebase for start_date..end_date, as {day: {key: record}} (one key-range read)."""
+    return (
+        reference(f"barbers/{barber_id}/logs")
+        .order_by_key()
+        .start_at(start_date.isoformat())
+        .end_at(end_date.isoformat())
+        .get()
+    ) or {}
+
+
+def load_logs(barber_id: str, start_date, end_date, columns=None) -> pd.DataFrame:
+    """
+    Walk-in log rows for start_date..end_date: archived days from Parquet, anything
+    newer (normally just today) from Firebase.
+    """
+    frames = []
+    last = last_archived_day(barber_id)
+    if last is not None and last >= start_date:
+        frames.append(read_archive(barber_id, start_date, min(end_date, last), columns).to_pandas())
+
+    live_from = max(start_date, last + timedelta(days=1)) if last is not None else start_date
+    if live_from <= end_date:
+        live = logs_to_table(get_live_logs(barber_id, live_from, end_date))
+        frames.append(live.select(list(columns or SCHEMA.names)).to_pandas())
+    if not frames:
+        return SCHEMA.empty_table().select(list(columns or SCHEMA.names)).to_pandas()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
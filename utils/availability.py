@@ -0,0 +1,249 @@
+# utils/availability.py
+"""
+Per-day availability kept up to date on every write, so the booking page can draw its
+time picker from one small node instead of re-deriving it from bookings and walk-ins.
+
+`barbers/{id}/availability/{YYYY-MM-DD}` holds:
+    open_hour, close_hour, slot_minutes  - the grid the bitmap was built for
+    booked                               - hex bitmap, bit i set = slot i is booked
+    walkins                              - walk-ins that joined that day and are still queued
+
+Walk-ins aren't stored per slot: their placement only depends on how many there are
+(they fill gaps from max(now, open) in join order), so a counter is enough.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.firebase_utils import get_barber_config
+from utils.scheduling import LONDON, BusySlots, parse_time, place_walkins
+from utils.storage import reference
+
+
+class _StaleGrid(Exception):
+    """The stored bitmap is missing or was built for different opening hours / cut length."""
+
+
+def availability_ref(barber_id: str, day):
+    return reference(f"barbers/{barber_id}/availability/{day}")
+
+
+def _grid(settings: dict) -> dict:
+    return {
+        "open_hour": int(settings.get("open_hour", 10)),
+        "close_hour": int(settings.get("close_hour", 22)),
+        "slot_minutes": int(settings.get("avg_cut_duration", 25)),
+    }
+
+
+def _open_time(day, grid: dict, tz=LONDON) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=tz).replace(hour=grid["open_hour"])
+
+
+def _slot_count(grid: dict) -> int:
+    return max(0, (grid["close_hour"] - grid["open_hour"]) * 60 // grid["slot_minutes"])
+
+
+def _slot_indexes(start: datetime, day, grid: dict) -> range:
+    """Grid slots that a cut starting at `start` overlaps (one, or two if it is off-grid)."""
+    offset = (start - _open_time(day, grid)) / timedelta(minutes=grid["slot_minutes"])
+    first = int(offset // 1)
+    last = first if offset == first else first + 1
+    return range(max(first, 0), min(last, _slot_count(grid) - 1) + 1)
+
+
+@dataclass
+class DayAvailability:
+    day: object
+    grid: dict
+    bits: str         # hex bitmap of booked slots
+    walkins: int
+
+    @property
+    def booked(self) -> list:
+        """One bool per slot."""
+        return decode(self.bits, _slot_count(self.grid))
+
+    @property
+    def open_time(self) -> datetime:
+        return _open_time(self.day, self.grid)
+
+    @property
+    def duration(self) -> timedelta:
+        return timedelta(minutes=self.grid["slot_minutes"])
+
+    def free_slots(self, now: datetime) -> list:
+        """Bookable start times, with today's walk-ins placed exactly as the kiosk places them."""
+        open_time, duration = self.open_time, self.duration
+        close_time = open_time + duration * len(self.booked)
+        is_today = self.day == now.date()
+
+        busy = BusySlots()
+        for i, taken in enumerate(self.booked):
+            if taken:
+                busy.add(open_time + duration * i, open_time + duration * (i + 1))
+        if is_today:
+            for start in place_walkins(busy, self.walkins, max(open_time, now.replace(second=0, microsecond=0)), duration):
+                busy.add(start, start + duration)
+
+        return busy.free_slots(open_time, close_time, duration, not_before=now if is_today else None)
+
+
+def encode(booked) -> str:
+    return format(sum(1 << i for i, taken in enumerate(booked) if taken), "x")
+
+
+def decode(bits: str, count: int) -> list:
+    value = int(bits or "0", 16)
+    return [bool(value >> i & 1) for i in range(count)]
+
+
+def _is_current(node, grid: dict) -> bool:
+    return bool(node) and all(node.get(k) == v for k, v in grid.items())
+
+
+def rebuild_day(barber_id: str, day, settings: dict) -> DayAvailability:
+    """
+    Recompute a day's bitmap from its bookings (first use, or after the hours changed).
+
+    Written with a transaction that leaves the node alone if it is already current: a
+    mark_booking that landed while we were reading the bookings (or a rebuild that saw
+    more of them) isn't overwritten by our older view.
+    """
+    from utils.bookings import get_bookings_on  # imported here: utils.bookings imports this module
+
+    grid = _grid(settings)
+    booked = [False] * _slot_count(grid)
+    for booking in get_bookings_on(barber_id, day).values():
+        start = parse_time(booking.get("slot")) if isinstance(booking, dict) else None
+        if start is not None:
+            for i in _slot_indexes(start, day, grid):
+                booked[i] = True
+
+    def replace_stale(current):
+        if _is_current(current, grid):
+            return current
+        return {**grid, "booked": encode(booked), "walkins": int((current or {}).get("walkins", 0))}
+
+    node = availability_ref(barber_id, day).transaction(replace_stale)
+    return DayAvailability(day, grid, node.get("booked") or "0", max(0, int(node.get("walkins", 0))))
+
+
+def load_day(barber_id: str, day, settings: dict) -> DayAvailability:
+    """One small read; rebuilt from bookings only if missing or built for another grid."""
+    node = availability_ref(barber_id, day).get()
+    grid = _grid(settings)
+    if not _is_current(node, grid):
+        return rebuild_day(barber_id, day, settings)
+    return DayAvailability(day, grid, node.get("booked") or "0", max(0, int(node.get("walkins", 0))))
+
+
+def mark_booking(barber_id: str, slot: str, settings: dict = None, booked: bool = True) -> None:
+    """Set (booking made) or clear (booking cancelled) the bits for one booking's slot."""
+    settings = settings or get_barber_config(barber_id)
+    start = parse_time(slot)
+    day = start.date()
+    grid = _grid(settings)
+
+    def toggle(current):
+        if not _is_current(current, grid):
+            raise _StaleGrid()
+        bits = int(current.get("booked") or "0", 16)
+        for i in _slot_indexes(start, day, grid):
+            bits = bits | (1 << i) if booked else bits & ~(1 << i)
+        return {**current, "booked": format(bits, "x")}
+
+    try:
+        availability_ref(barber_id, day).transaction(toggle)
+    except _StaleGrid:
+        rebuild_day(barber_id, day, settings)  # reads the bookings as they are now
+
+
+def load_days(barber_id: str, first_day, days: int, settings: dict) -> list:
+    """DayAvailability for `days` consecutive days from one key-range read of the availability node."""
+    last_day = first_day + timedelta(days=days - 1)
+    nodes = (
+        reference(f"barbers/{barber_id}/availability")
+        .order_by_key().start_at(first_day.isoformat()).end_at(last_day.isoformat())
+        .get()
+    ) or {}
+
+    grid = _grid(settings)
+    result = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        node = nodes.get(day.isoformat())
+        if not _is_current(node, grid):
+            result.append(rebuild_day(barber_id, day, settings))
+        else:
+            result.append(DayAvailability(day, grid, node.get("booked") or "0", max(0, int(node.get("walkins", 0)))))
+    return result
+
+
+@dataclass
+class AvailabilityGrid:
+    days: list          # dates, one per row
+    open_time: list     # aware datetime of slot 0, per row
+    duration: timedelta
+    free: np.ndarray    # bool [days, slots]
+
+    def slot_time(self, row: int, col: int) -> datetime:
+        return self.open_time[row] + self.duration * int(col)
+
+    def row(self, day):
+        """Row index for `day`, or None if it is outside the grid."""
+        return self.days.index(day) if day in self.days else None
+
+    def free_slots(self, row: int) -> list:
+        return [self.slot_time(row, col) for col in np.flatnonzero(self.free[row])]
+
+    def free_counts(self) -> np.ndarray:
+        return self.free.sum(axis=1)
+
+    def first_free_per_day(self) -> list:
+        """Earliest free start per row (None for fully booked days)."""
+        has_free = self.free.any(axis=1)
+        cols = self.free.argmax(axis=1)
+        return [self.slot_time(r, c) if has_free[r] else None for r, c in enumerate(cols)]
+
+    def first_free(self):
+        """(day, start) of the earliest free slot in the grid, or None."""
+        flat = self.free.ravel()
+        if not flat.any():
+            return None
+        row, col = divmod(int(flat.argmax()), self.free.shape[1])
+        return self.days[row], self.slot_time(row, col)
+
+
+def availability_grid(barber_id: str, first_day, days: int, settings: dict, now: datetime) -> AvailabilityGrid:
+    """
+    Free/booked matrix for the next `days` days in one pass: bitmaps are decoded together
+    with NumPy, past slots masked with a single comparison, and only today's row needs the
+    walk-in placement.
+    """
+    grid = _grid(settings)
+    slots = _slot_count(grid)
+    duration = timedelta(minutes=grid["slot_minutes"])
+    loaded = load_days(barber_id, first_day, days, settings)
+
+    width = max(1, (slots + 7) // 8)
+    packed = np.frombuffer(b"".join(
+        int(d.bits, 16).to_bytes(width, "little") for d in loaded
+    ), dtype=np.uint8).reshape(days, width)
+    booked = np.unpackbits(packed, axis=1, bitorder="little")[:, :slots].astype(bool)
+    free = ~booked
+
+    # Slots that have already started today (or earlier) are never bookable
+    open_times = [_open_time(d.day, grid) for d in loaded]
+    offsets = np.arange(slots) * grid["slot_minutes"]
+    minutes_since_open = np.array([(now - t).total_seconds() / 60 for t in open_times])
+    free &= offsets[None, :] >= minutes_since_open[:, None]
+
+    # Today's walk-ins: same placement as the kiosk, for that one row
+    for row, d in enumerate(loaded):
+        if d.day == now.date() and d.walkins:
+            today_free = {int((t - open_times[row]) / duration) for t in d.free_slots(now)}
+            free[row] &= np.isin(np.arange(slots), list(today_free))
+
+    return AvailabilityGrid([d.day for d in loaded], open_times, duration, free)
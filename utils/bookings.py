@@ -0,0 +1,253 @@
+# utils/bookings.py
+"""
+Every booking read and write goes through here.
+
+Bookings are partitioned by day: `barbers/{id}/bookings/{YYYY-MM-DD}/{key}`, so a page
+only ever touches the days it shows. Shops created before the partitioned layout may
+still have flat `bookings/{push_key}` records until `scripts/migrate_bookings.py` has
+moved them; until a shop's migration is marked done, reads merge those in as well.
+"""
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.availability import mark_booking
+from utils.cache import TTLCache
+from utils.instrumentation import attach_trace, current_trace
+from utils.journal import get_journal
+from utils.rollups import rollup_paths
+from utils.scheduling import parse_time
+from utils.storage import QueryError, StorageUnavailable, new_push_key, reference
+
+log = logging.getLogger(__name__)
+
+MIGRATION = "bookings_by_date"
+PARTITION_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Sorts after any character that can follow a date in an ISO slot string
+_RANGE_END = "\uf8ff"
+_migration_cache = TTLCache(ttl=300)
+_count_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="booking-count")
+
+
+def booking_day(slot: str) -> str:
+    """Partition key (YYYY-MM-DD) for an ISO slot string."""
+    day = str(slot)[:10]
+    if not PARTITION_RE.fullmatch(day):
+        raise ValueError(f"Booking slot {slot!r} has no date.")
+    return day
+
+
+def bookings_ref(barber_id: str, day=None):
+    """Reference to the bookings node, or to one day's partition."""
+    path = f"barbers/{barber_id}/bookings"
+    return reference(f"{path}/{day}" if day else path)
+
+
+def booking_path(barber_id: str, key: str, slot: str) -> str:
+    return f"barbers/{barber_id}/bookings/{booking_day(slot)}/{key}"
+
+
+def slot_path(barber_id: str, slot: str) -> str:
+    """Reservation node for a slot: `slots/{YYYY-MM-DD}/{HHMM}`."""
+    return f"barbers/{barber_id}/slots/{booking_day(slot)}/{parse_time(slot).strftime('%H%M')}"
+
+
+class SlotTakenError(Exception):
+    """The slot was reserved by another booking first."""
+
+    def __init__(self, slot: str, same_phone: bool = False):
+        super().__init__(f"Slot {slot} is already taken.")
+        self.slot = slot
+        self.same_phone = same_phone
+
+
+def filter_bookings(bookings: dict, start_date, end_date) -> dict:
+    """Bookings whose slot date is within start_date..end_date (inclusive), in memory."""
+    lo, hi = start_date.isoformat(), end_date.isoformat() + _RANGE_END
+    return {
+        key: booking for key, booking in (bookings or {}).items()
+        if isinstance(booking, dict) and lo <= str(booking.get("slot", "")) <= hi
+    }
+
+
+def is_migrated(barber_id: str) -> bool:
+    """True once every flat booking of this shop has been moved into day partitions."""
+    state = _migration_cache.get_or_load(
+        barber_id, lambda: reference(f"barbers/{barber_id}/migrations/{MIGRATION}").get() or {}
+    )
+    return bool(state.get("done"))
+
+
+def get_legacy_bookings_between(barber_id: str, start_date, end_date) -> dict:
+    """Not-yet-migrated flat bookings in the window (empty once the shop is migrated)."""
+    if is_migrated(barber_id):
+        return {}
+    ref = bookings_ref(barber_id)
+    try:
+        result = (
+            ref.order_by_child("slot")
+            .start_at(start_date.isoformat())
+            .end_at(end_date.isoformat() + _RANGE_END)
+            .get()
+        )
+        return dict(result or {})
+    except QueryError as e:
+        log.warning("Range query on %s failed (%s); filtering a full read instead.", ref.path, e)
+        flat = {k: v for k, v in (ref.get() or {}).items() if not PARTITION_RE.fullmatch(k)}
+        return filter_bookings(flat, start_date, end_date)
+
+
+def get_bookings_between(barber_id: str, start_date, end_date) -> dict:
+    """
+    {key: booking} for start_date..end_date (inclusive). Reads only those days'
+    partitions with a key-range query, so cost follows the window, not the shop's age.
+    """
+    partitions = (
+        bookings_ref(barber_id)
+        .order_by_key()
+        .start_at(start_date.isoformat())
+        .end_at(end_date.isoformat())
+        .get()
+    ) or {}
+
+    bookings = get_legacy_bookings_between(barber_id, start_date, end_date)
+    for day, day_bookings in partitions.items():
+        if PARTITION_RE.fullmatch(day) and isinstance(day_bookings, dict):
+            bookings.update(day_bookings)
+    return bookings
+
+
+def get_bookings_on(barber_id: str, day) -> dict:
+    return get_bookings_between(barber_id, day, day)
+
+
+def count_bookings_between(barber_id: str, start_date, end_date) -> int:
+    """
+    Number of bookings in start_date..end_date (inclusive) from keys-only reads: the day
+    partitions are listed shallowly, and those in the window are counted concurrently
+    without downloading their records.
+    """
+    lo, hi = start_date.isoformat(), end_date.isoformat()
+    days = [
+        day for day in (bookings_ref(barber_id).get(shallow=True) or {})
+        if PARTITION_RE.fullmatch(day) and lo <= day <= hi
+    ]
+    trace = current_trace()
+
+    def count(day):
+        with attach_trace(trace):
+            return len(bookings_ref(barber_id, day).get(shallow=True) or {})
+
+    legacy = len(get_legacy_bookings_between(barber_id, start_date, end_date))
+    return legacy + sum(_count_pool.map(count, days))
+
+
+def _claim_for(key: str, booking: dict) -> dict:
+    return {"booking": key, "phone_e164": booking.get("phone_e164", ""), "claimed_at": booking.get("created_at", "")}
+
+
+def _booking_at(barber_id: str, slot: str, exclude: str):
+    """(key, booking) of another booking already written for exactly `slot`, or None."""
+    start = parse_time(slot)
+    for other, booking in get_bookings_on(barber_id, start.date()).items():
+        if other != exclude and isinstance(booking, dict) and parse_time(booking.get("slot")) == start:
+            return other, booking
+    return None
+
+
+def claim_slot(barber_id: str, key: str, booking: dict) -> None:
+    """
+    Reserve the booking's slot for `key` with a transaction on its reservation node.
+    Raises SlotTakenError if another booking holds it; claiming it again for `key` is a no-op.
+
+    Bookings made before reservations existed (or moved by the partition migration) have
+    no claim, so the day's bookings are checked first; one found at this slot is given its
+    claim there and then, and this booking is turned away.
+    """
+    slot = booking["slot"]
+    claim = _claim_for(key, booking)
+
+    existing = _booking_at(barber_id, slot, exclude=key)
+    if existing is not None:
+        other, other_booking = existing
+        reference(slot_path(barber_id, slot)).transaction(
+            lambda current: current or _claim_for(other, other_booking)
+        )
+        same_phone = bool(claim["phone_e164"]) and other_booking.get("phone_e164") == claim["phone_e164"]
+        raise SlotTakenError(slot, same_phone=same_phone)
+
+    def take(current):
+        if current and current.get("booking") == key:
+            return current  # claimed by an earlier attempt of this same booking
+        if current:
+            same_phone = bool(claim["phone_e164"]) and current.get("phone_e164") == claim["phone_e164"]
+            raise SlotTakenError(slot, same_phone=same_phone)
+        return claim
+
+    reference(slot_path(barber_id, slot)).transaction(take)
+
+
+def reserve_booking(barber_id: str, booking: dict, settings: dict = None, key: str = None,
+                    extra_paths: dict = None) -> str:
+    """
+    Claim the booking's slot (claim_slot), then write the booking into its day's partition
+    (with `extra_paths`, atomically). Returns the key; raises SlotTakenError if another
+    booking holds the slot, so two customers can never both get the same time. Retrying
+    with the same `key` is safe.
+    """
+    slot = booking["slot"]
+    key = key or new_push_key()
+    claim_slot(barber_id, key, booking)
+    reservation = reference(slot_path(barber_id, slot))
+    try:
+        # The booking and its dashboard counters land together
+        reference().update({
+            booking_path(barber_id, key, slot): booking,
+            **rollup_paths(barber_id, slot, "booking"),
+            **(extra_paths or {}),
+        })
+    except Exception:
+        reservation.delete()  # don't leave a slot held by a booking that was never written
+        raise
+    try:
+        mark_booking(barber_id, slot, settings)
+    except StorageUnavailable:
+        # The booking and its reservation are in; only the availability overview lags behind
+        log.warning("Booking %s placed but availability not updated for %s", key, slot)
+    return key
+
+
+def queue_booking(barber_id: str, booking: dict, settings: dict = None, key: str = None) -> str:
+    """
+    Journal a booking to be placed once the database is reachable again (utils/journal.py).
+    The slot is only claimed then; if it has gone by then, the Admin Panel shows the conflict.
+    Pass the `key` of a reserve_booking() attempt that failed, so a claim (or booking) it left
+    behind is recognised as this booking's own when the journal replays it.
+    """
+    key = key or new_push_key()
+    get_journal().append(barber_id, "booking", key, {
+        "booking": booking, "settings": settings, "path": booking_path(barber_id, key, booking["slot"]),
+    })
+    return key
+
+
+def booking_removal_paths(barber_id: str, key: str, slot: str) -> dict:
+    """
+    Multi-path entries that remove a booking: its partition record and its flat copy from
+    before the migration (a no-op if there is none). Nothing is read, so they can be
+    journaled offline; the slot reservation is freed afterwards with release_slot().
+    """
+    return {booking_path(barber_id, key, slot): None, f"barbers/{barber_id}/bookings/{key}": None}
+
+
+def release_slot(barber_id: str, key: str, slot: str) -> bool:
+    """
+    Free the slot's reservation if booking `key` holds it (a transaction, so a claim made
+    meanwhile by another booking is left alone). True if the slot is free afterwards.
+    """
+    def release(current):
+        return None if not current or current.get("booking") == key else current
+
+    return reference(slot_path(barber_id, slot)).transaction(release) is None
+
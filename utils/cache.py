@@ -0,0 +1,46 @@
+# utils/cache.py
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Small process-wide cache for rarely changing Firebase reads.
+
+    Entries expire after `ttl` seconds and can be dropped early with invalidate()
+    whenever we write the data ourselves. Shared by every Streamlit session, so
+    access goes through a lock.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for `key`, calling `loader()` on a miss or after expiry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, key=None) -> None:
+        """Drop one key, or everything when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "ttl": self.ttl}
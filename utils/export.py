@@ -0,0 +1,89 @@
+# utils/export.py
+"""
+Log export for any date range, built one month at a time so only one month of rows is
+held as Arrow data however long the range is. Rows are streamed into a
+SpooledTemporaryFile (kept in memory while small, moved to disk beyond that) as CSV,
+gzipped CSV or Parquet. The finished file is then returned as bytes for
+st.download_button, so peak memory is the size of the finished file.
+"""
+import gzip
+import io
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from utils.archive import get_live_logs, last_archived_day, logs_to_table, read_archive
+
+COLUMNS = ["name", "joined_at"]
+FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+_SPOOL_MAX = 8 * 1024 * 1024
+
+
+def _month_windows(start_date, end_date):
+    """(first, last) day pairs covering start_date..end_date, split at month boundaries."""
+    first = start_date
+    while first <= end_date:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end_date, next_month - timedelta(days=1))
+        yield first, last
+        first = next_month
+
+
+def iter_log_chunks(barber_id: str, start_date, end_date):
+    """Arrow tables of (name, joined_at) in time order, one month per chunk."""
+    archived_until = last_archived_day(barber_id)
+    for first, last in _month_windows(start_date, end_date):
+        parts = []
+        if archived_until is not None and first <= archived_until:
+            parts.append(read_archive(barber_id, first, min(last, archived_until), columns=COLUMNS))
+        live_from = first if archived_until is None else max(first, archived_until + timedelta(days=1))
+        if live_from <= last:
+            parts.append(logs_to_table(get_live_logs(barber_id, live_from, last)).select(COLUMNS))
+
+        chunk = pa.concat_tables(parts).sort_by("joined_at") if parts else None
+        if chunk is not None and chunk.num_rows:
+            yield chunk
+
+
+def _csv_chunk(table: pa.Table, header: bool) -> bytes:
+    table = table.set_column(1, "joined_at", table.column("joined_at").to_pandas().dt.strftime("%Y-%m-%d %H:%M:%S"))
+    out = io.BytesIO()
+    pacsv.write_csv(table, out, pacsv.WriteOptions(include_header=header))
+    return out.getvalue()
+
+
+def export_logs(barber_id: str, start_date, end_date, fmt: str = "csv"):
+    """
+    The export as bytes (built in a spooled temp file, a month at a time), or None if
+    there are no logs in the range.
+    """
+    out = SpooledTemporaryFile(max_size=_SPOOL_MAX)
+    rows = 0
+    if fmt == "parquet":
+        writer = None
+        for chunk in iter_log_chunks(barber_id, start_date, end_date):
+            writer = writer or pq.ParquetWriter(out, chunk.schema, compression="zstd")
+            writer.write_table(chunk)  # one row group per month
+            rows += chunk.num_rows
+        if writer is not None:
+            writer.close()
+    else:
+        sink = gzip.GzipFile(fileobj=out, mode="wb") if fmt == "csv.gz" else out
+        for i, chunk in enumerate(iter_log_chunks(barber_id, start_date, end_date)):
+            sink.write(_csv_chunk(chunk, header=i == 0))  # header only on the first month
+            rows += chunk.num_rows
+        if sink is not out:
+            sink.close()
+
+    with out:
+        if not rows:
+            return None
+        out.seek(0)
+        return out.read()
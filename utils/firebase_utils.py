@@ -1,62 +1,123 @@
 # utils/firebase_utils.py
-import firebase_admin
-from firebase_admin import credentials, db
-import json
-import streamlit as st
 import re
 from datetime import datetime
+from utils.cache import TTLCache
+from utils.instrumentation import span
+from utils.journal import get_journal
+from utils.rollups import rollup_paths
+from utils.scheduling import parse_time
+from utils.secrets import secret
+from utils.storage import new_push_key, reference
 
-# Initialise Firebase if not already done
-if not firebase_admin._apps:
-    cred = credentials.Certificate(json.loads(st.secrets["firebase_creds"]))
-    firebase_admin.initialize_app(cred, {
-        'databaseURL': st.secrets["firebase_db_url"]
-    })
+
+# Settings and the barber list change rarely but are read on every rerun of every page
+_config_cache = TTLCache(ttl=float(secret("config_cache_ttl", 300)))
 
 
 def get_barber_config(barber_id: str = "default_barber") -> dict:
-    ref = db.reference(f"barbers/{barber_id}/settings")
-    config = ref.get() or {}
-    st.write(f"DEBUG: Fetched barber config for {barber_id}: {config}")  # Debugging line
-    return config
+    with span("config.load"):
+        config = _config_cache.get_or_load(
+            ("settings", barber_id),
+            lambda: reference(f"barbers/{barber_id}/settings").get() or {}
+        )
+    return dict(config)
+
+
+def get_barber_directory() -> dict:
+    """
+    {barber_id: {"shop_name": ..., "logo_url": ...}} from the small `barber_index` node.
+    Falls back to a shallow, keys-only listing of `barbers` if the index hasn't been built.
+    """
+    def load():
+        index = reference("barber_index").get() or {}
+        if not index:
+            index = {barber_id: {} for barber_id in (reference("barbers").get(shallow=True) or {})}
+        return index
+
+    return dict(_config_cache.get_or_load("barber_index", load))
 
 
 def get_all_barber_ids() -> list:
-    ref = db.reference("barbers")
-    return list(ref.get().keys()) if ref.get() else []
+    return list(get_barber_directory().keys())
 
 
-from firebase_admin import db
-from datetime import datetime
+def _index_entry(settings: dict) -> dict:
+    return {"shop_name": settings.get("shop_name", ""), "logo_url": settings.get("logo_url", "")}
+
+
+def rebuild_barber_index() -> int:
+    """Recreate `barber_index` from each barber's settings (for shops created before the index)."""
+    barber_ids = reference("barbers").get(shallow=True) or {}
+    index = {
+        barber_id: _index_entry(reference(f"barbers/{barber_id}/settings").get() or {})
+        for barber_id in barber_ids
+    }
+    reference("barber_index").set(index)
+    invalidate_barber_cache()
+    return len(index)
+
+
+def invalidate_barber_cache(barber_id: str = None) -> None:
+    """Forget cached reads after a write. Without a barber_id, clears everything."""
+    if barber_id is None:
+        _config_cache.invalidate()
+    else:
+        _config_cache.invalidate(("settings", barber_id))
+        _config_cache.invalidate("barber_index")
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters for the config cache."""
+    return _config_cache.stats()
+
 
+def update_barber_settings(barber_id: str, updates: dict) -> None:
+    """Write changed settings fields (and the directory entry, if affected) and drop the cached copy."""
+    paths = {f"barbers/{barber_id}/settings/{field}": value for field, value in updates.items()}
+    for field in ("shop_name", "logo_url"):
+        if field in updates:
+            paths[f"barber_index/{barber_id}/{field}"] = updates[field]
+    reference().update(paths)
+    invalidate_barber_cache(barber_id)
 
-def create_new_barber(barber_id: str):
-    barber_ref = db.reference(f"barbers/{barber_id}")
 
-    # 🔒 Safety check: Don't overwrite if already exists
-    if barber_ref.get():
+def create_new_barber(barber_id: str, shop_name: str = "New Barber", admin_pin: str = "0000",
+                      logo_url: str = "", avg_cut_duration: int = 25, open_hour: int = 10,
+                      close_hour: int = 22):
+    # 🔒 Safety check: Don't overwrite if already exists (shallow, so we don't download their history)
+    if reference(f"barbers/{barber_id}").get(shallow=True):
         print(f"❌ Barber '{barber_id}' already exists. Skipping creation.")
         return False
 
     # ✅ Default values
-    barber_ref.set({
-        "config": {
-            "admin_pin": "0000"  # Change this manually or allow setting it dynamically
-        },
-        "settings": {
-            "avg_cut_duration": 25,
-            "open_hour": 10,
-            "close_hour": 22,
-            "shop_name": "New Barber",
-            "logo_url": ""  # Optional: Set default logo
+    settings = {
+        "avg_cut_duration": avg_cut_duration,
+        "open_hour": open_hour,
+        "close_hour": close_hour,
+        "shop_name": shop_name,
+        "logo_url": logo_url  # Optional: Set default logo
+    }
+
+    # Barber node and directory entry in one atomic write
+    reference().update({
+        f"barbers/{barber_id}": {
+            "config": {
+                "admin_pin": admin_pin  # Change this manually or allow setting it dynamically
+            },
+            "settings": settings,
+            "walkins": {},
+            "bookings": {},
+            "migrations": {
+                "bookings_by_date": {"done": True}  # new shops start on the partitioned layout
+            },
+            "logs": {
+                datetime.now().strftime("%Y-%m-%d"): {}
+            }
         },
-        "walkins": {},
-        "bookings": {},
-        "logs": {
-            datetime.now().strftime("%Y-%m-%d"): {}
-        }
+        f"barber_index/{barber_id}": _index_entry(settings),
     })
 
+    invalidate_barber_cache(barber_id)
     print(f"✅ Barber '{barber_id}' created successfully.")
     return True
 
@@ -69,7 +130,7 @@ def is_valid_uk_phone(phone):
 def push_booking(barber_id, name, phone, slot_datetime):
     """
     Pushes a new booking to Firebase under the given barber's node.
-    Validates UK phone format before pushing.
+    Validates UK phone format before pushing; raises SlotTakenError if the slot is gone.
     """
     if not is_valid_uk_phone(phone):
         raise ValueError("Invalid phone number. Must start with '07' and be 11 digits.")
@@ -81,4 +142,76 @@ def push_booking(barber_id, name, phone, slot_datetime):
         "slot": slot_str
     }
 
-    db.reference(f"barbers/{barber_id}/bookings").push(booking_data)
+    from utils.bookings import reserve_booking  # imported here: utils.bookings imports this module
+    return reserve_booking(barber_id, booking_data)
+
+
+def complete_queue_entries(barber_id: str, items: list, walkins: dict, bookings: dict,
+                           now: datetime, settings: dict = None) -> int:
+    """
+    Mark queue items (dicts with key, source and start, as BarberSchedule.queue() returns)
+    as served in one multi-path update: each entry is removed and a served record with its
+    service start/end is written to `served/{YYYY-MM-DD}/{key}`. The update goes through the
+    write-behind journal (utils/journal.py) without reading anything first, so it works
+    offline; booking slots are released when it is replayed. Returns how many were served.
+    """
+    from utils.bookings import booking_path, booking_removal_paths  # imported here: utils.bookings imports this module
+
+    paths = {}
+    requires = []
+    walkins_by_day = {}
+    served_bookings = []
+    served = 0
+    for item in items:
+        key, source = item["key"], item["source"]
+        record = (walkins if source == "walkin" else bookings).get(key)
+        if not isinstance(record, dict):
+            continue  # already served from another screen
+        if source == "walkin":
+            paths[f"barbers/{barber_id}/walkins/{key}"] = None
+            requires.append(f"barbers/{barber_id}/walkins/{key}")
+            joined = parse_time(record.get("joined_at")) or now
+            walkins_by_day[joined.date()] = walkins_by_day.get(joined.date(), 0) + 1
+        else:
+            paths.update(booking_removal_paths(barber_id, key, record["slot"]))
+            requires.append(booking_path(barber_id, key, record["slot"]))
+            served_bookings.append([key, record["slot"]])
+        paths[f"barbers/{barber_id}/served/{now.date().isoformat()}/{key}"] = {
+            **record,
+            "source": source,
+            "service_start": min(item["start"], now).isoformat(),
+            "service_end": now.isoformat(),
+        }
+        served += 1
+
+    # Walk-ins no longer queued free their place in that day's availability count
+    for day, count in walkins_by_day.items():
+        paths[f"barbers/{barber_id}/availability/{day.isoformat()}/walkins"] = {".sv": {"increment": -count}}
+
+    if paths:
+        get_journal().append(barber_id, "update", new_push_key(), {
+            "paths": paths, "requires": requires, "release": served_bookings, "settings": settings,
+        })
+    return served
+
+
+def join_queue(barber_id: str, name: str, now: datetime, schedule, feed=None) -> tuple:
+    """
+    Add a walk-in with one atomic multi-path update: the queue entry, the day's log entry,
+    the dashboard counters and the day's availability count. The key is generated here, so
+    nothing can be written half-way. The update is journaled locally and flushed in the
+    background (utils/journal.py), so this returns without waiting for the database.
+    Returns (position, estimated start) from `schedule`.
+    """
+    key = new_push_key()
+    day = now.date().isoformat()
+    walkin = {"name": name, "joined_at": now.isoformat()}
+    get_journal().append(barber_id, "update", key, {"paths": {
+        f"barbers/{barber_id}/walkins/{key}": walkin,
+        f"barbers/{barber_id}/logs/{day}/{key}": walkin,
+        f"barbers/{barber_id}/availability/{day}/walkins": {".sv": {"increment": 1}},
+        **rollup_paths(barber_id, now, "walkin"),
+    }})
+    if feed is not None:
+        feed.apply_local("walkins", key, walkin)
+    return schedule.add_walkin(key, walkin)
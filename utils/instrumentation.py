@@ -0,0 +1,262 @@
+# utils/instrumentation.py
+"""
+Timing spans and counters for the hot paths of every page.
+
+Each page calls start_rerun() at the top and finish_rerun() at the bottom; anything in
+between can be wrapped in `with span("name"):`, and the body of an st.fragment in
+`with fragment_rerun("page.section"):`. Storage calls are spanned automatically
+(see utils/storage/instrumented.py), with their payload sizes. A finished rerun is:
+
+- kept in the session, so the Admin diagnostics panel can show where the time went,
+- added to process-wide totals (exported as Prometheus text), and
+- logged as one JSON line on the `queue.metrics` logger.
+
+Once a session has logged in on the Admin Panel (allow_profiling), adding `?profile=1`
+to a page's URL captures a cProfile of each rerun of that session.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+log = logging.getLogger("queue.metrics")
+
+TRACE_KEY = "_rerun_trace"
+LAST_TRACE_KEY = "_last_rerun_trace"
+PROFILE_KEY = "_rerun_profile"
+PROFILE_ALLOWED_KEY = "_rerun_profile_allowed"
+
+_local = threading.local()
+_totals_lock = threading.Lock()
+_totals = {}                      # span name -> [calls, seconds, max seconds, bytes]
+_recent = deque(maxlen=500)       # finished reruns from every session, newest last
+
+
+class RerunTrace:
+    def __init__(self, page: str):
+        self.page = page
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.ended = None
+        self.spans = []           # (name, start offset s, duration s, bytes)
+        self.profiler = None
+
+    def as_dict(self) -> dict:
+        end = self.ended or time.perf_counter()
+        return {
+            "page": self.page,
+            "at": round(self.started_at, 3),
+            "total_ms": round((end - self.started) * 1000, 3),
+            "spans": [
+                {"name": name, "start_ms": round(start * 1000, 3), "ms": round(took * 1000, 3), "bytes": nbytes}
+                for name, start, took, nbytes in self.spans
+            ],
+        }
+
+
+def _current():
+    return getattr(_local, "trace", None)
+
+
+def current_trace():
+    """The rerun being timed on this thread, to hand to worker threads (see attach_trace)."""
+    return _current()
+
+
+@contextmanager
+def attach_trace(trace):
+    """Record spans from this (worker) thread into `trace`, a rerun running on another thread."""
+    previous = _current()
+    _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
+
+
+def _in_session() -> bool:
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+
+def record(name: str, seconds: float, nbytes: int = 0, started: float = None) -> None:
+    """Add one measurement to the process totals and, inside a rerun, to its trace."""
+    with _totals_lock:
+        total = _totals.setdefault(name, [0, 0.0, 0.0, 0])
+        total[0] += 1
+        total[1] += seconds
+        total[2] = max(total[2], seconds)
+        total[3] += nbytes
+    trace = _current()
+    if trace is not None and trace.ended is None:
+        started = started if started is not None else time.perf_counter() - seconds
+        trace.spans.append((name, started - trace.started, seconds, nbytes))
+
+
+@contextmanager
+def span(name: str):
+    """Time a block. Yields a dict; set `["bytes"]` in it to record a payload size."""
+    info = {"bytes": 0}
+    started = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(name, time.perf_counter() - started, info["bytes"], started)
+
+
+def start_rerun(page: str) -> None:
+    """Begin timing this rerun (and close the session's previous one if it ended early)."""
+    if not _in_session():
+        return
+    previous = st.session_state.get(TRACE_KEY)
+    if previous is not None and previous.ended is None:
+        _finish(previous, early=True)  # st.stop()/st.rerun() skipped finish_rerun()
+
+    trace = RerunTrace(page)
+    if st.session_state.get(PROFILE_ALLOWED_KEY) and st.query_params.get("profile") == "1":
+        trace.profiler = cProfile.Profile()
+        trace.profiler.enable()
+    _local.trace = trace
+    st.session_state[TRACE_KEY] = trace
+
+
+def allow_profiling(allowed: bool = True) -> None:
+    """Let this session profile its reruns with `?profile=1`. Only call past the admin PIN check."""
+    if allowed:
+        st.session_state[PROFILE_ALLOWED_KEY] = True
+    else:
+        st.session_state.pop(PROFILE_ALLOWED_KEY, None)
+
+
+def finish_rerun() -> None:
+    trace = _current()
+    if trace is not None and trace.ended is None:
+        _finish(trace)
+
+
+@contextmanager
+def fragment_rerun(page: str):
+    """
+    Time the body of an st.fragment. During a full rerun its spans belong to the page's
+    trace; when the fragment reruns on its own (a run_every tick, or a widget inside it)
+    that is timed as a rerun of its own named `page`.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or not ctx.fragment_ids_this_run:
+        yield
+        return
+    start_rerun(page)
+    try:
+        yield
+    finally:
+        finish_rerun()
+
+
+def _finish(trace: RerunTrace, early: bool = False) -> None:
+    if early:
+        trace.ended = trace.started + max((start + took for _, start, took, _ in trace.spans), default=0.0)
+    else:
+        trace.ended = time.perf_counter()
+    data = trace.as_dict()
+    if trace.profiler is not None:
+        trace.profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(trace.profiler, stream=out).sort_stats("cumulative").print_stats(40)
+        if _in_session():
+            st.session_state[PROFILE_KEY] = out.getvalue()
+    record(f"rerun.{trace.page}", data["total_ms"] / 1000)
+    _recent.append(data)
+    if _in_session():
+        st.session_state[LAST_TRACE_KEY] = data
+    log.info(json.dumps(data))
+
+
+# --- Exports ---
+def totals() -> dict:
+    with _totals_lock:
+        return {
+            name: {"calls": calls, "seconds": seconds, "max_seconds": longest, "bytes": nbytes}
+            for name, (calls, seconds, longest, nbytes) in sorted(_totals.items())
+        }
+
+
+def recent_reruns() -> list:
+    return list(_recent)
+
+
+def prometheus_text() -> str:
+    """Process totals in the Prometheus text exposition format."""
+    lines = []
+    metrics = (
+        ("queue_span_calls_total", "counter", "Spans recorded", "calls"),
+        ("queue_span_seconds_total", "counter", "Time spent in spans", "seconds"),
+        ("queue_span_seconds_max", "gauge", "Longest single span", "max_seconds"),
+        ("queue_span_bytes_total", "counter", "Payload bytes moved in spans", "bytes"),
+    )
+    current = totals()
+    for metric, kind, help_text, field in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for name, values in current.items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{metric}{{span="{label}"}} {values[field]}')
+    return "\n".join(lines) + "\n"
+
+
+def render_diagnostics() -> None:
+    """Admin-only panel: the last rerun's spans, recent reruns per page, process totals and the config cache."""
+    import pandas as pd
+
+    from utils.firebase_utils import get_cache_stats  # imported here: firebase_utils imports this module
+
+    last = st.session_state.get(LAST_TRACE_KEY)
+    if last:
+        st.caption(f"Previous rerun of this session ({last['page']}): {last['total_ms']:.1f} ms")
+        st.dataframe(pd.DataFrame(last["spans"]), hide_index=True, width="stretch")
+
+    reruns = recent_reruns()
+    if reruns:
+        frame = pd.DataFrame([{"page": r["page"], "ms": r["total_ms"]} for r in reruns])
+        summary = frame.groupby("page")["ms"].describe(percentiles=[0.5, 0.95, 0.99])
+        st.caption(f"Last {len(reruns)} reruns across all sessions (ms)")
+        st.dataframe(summary[["count", "50%", "95%", "99%", "max"]], width="stretch")
+
+    current = totals()
+    if current:
+        st.caption("Process totals since start")
+        st.dataframe(
+            pd.DataFrame.from_dict(current, orient="index").rename_axis("span"),
+            width="stretch",
+        )
+
+    cache = get_cache_stats()
+    lookups = cache["hits"] + cache["misses"]
+    st.caption(
+        f"Config cache: {cache['hits']} hits / {cache['misses']} misses"
+        f" ({cache['hits'] / lookups:.0%} hit rate) · {cache['size']} entries · TTL {cache['ttl']:.0f} s"
+        if lookups else f"Config cache: empty · TTL {cache['ttl']:.0f} s"
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Metrics (Prometheus)", prometheus_text(), file_name="metrics.prom", mime="text/plain")
+    with col2:
+        st.download_button(
+            "⬇️ Recent reruns (JSON lines)",
+            "\n".join(json.dumps(r) for r in reruns),
+            file_name="reruns.jsonl",
+            mime="application/json",
+        )
+
+    profile = st.session_state.get(PROFILE_KEY)
+    if profile:
+        st.caption("cProfile of the previous rerun (`?profile=1`)")
+        st.code(profile)
+    else:
+        st.caption("Add `?profile=1` to the URL to profile this session's reruns.")
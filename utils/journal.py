@@ -0,0 +1,349 @@
+# utils/journal.py
+"""
+Write-behind journal for the writes a customer or the barber waits on: kiosk joins,
+admin completions and (when the database is unreachable) bookings.
+
+An operation is appended to a local SQLite file (synchronous=FULL, so it survives a
+crash or power cut) and acknowledged straight away; a background flusher replays
+pending operations to the backend in order, merging consecutive ones into one
+multi-path update. Until an operation lands, BarberFeed overlays its paths on the live
+snapshot, so the queue on screen already includes it.
+
+Operations:
+- "update": a multi-path update. `requires` lists paths that must still exist when it
+  is replayed (e.g. the walk-in being completed); if one is gone the operation is a
+  conflict and nothing is written. `release` lists [booking key, slot] pairs whose slot
+  reservations are freed (and availability bits cleared) once it has landed.
+- "booking": a booking to place with reserve_booking() under its op key, so a claim or
+  booking left by an earlier attempt with that key counts as its own; a slot taken by
+  another booking meanwhile is a conflict.
+
+Each operation writes `barbers/{id}/journal/{day}/{op_key}` with its changes. Before an
+operation that was already attempted is replayed, that marker is checked, so a write
+that landed just before a timeout or a crash is never applied twice (counter increments
+included). `scripts/archive_logs.py` prunes markers older than a week.
+
+An operation the database refuses (permission denied, invalid data) is set aside as a
+conflict rather than retried; a refused batch is replayed one operation at a time to
+find it. So is one that keeps failing (`max_failures` in a row) while the database is
+otherwise healthy. Conflicts stay in the journal for the Admin Panel to show and dismiss.
+"""
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.scheduling import LONDON
+from utils.secrets import secret
+from utils.storage import StorageUnavailable, get_storage, reference
+from utils.storage.base import is_under, join
+
+log = logging.getLogger(__name__)
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def _increment(value):
+    if isinstance(value, dict) and isinstance(value.get(".sv"), dict):
+        return value[".sv"].get("increment")
+    return None
+
+
+def merge_paths(merged: dict, paths: dict) -> bool:
+    """
+    Fold `paths` into the multi-path update `merged`, adding up server increments on the
+    same path. Returns False (leaving `merged` alone) if they overlap any other way.
+    """
+    staged = dict(merged)
+    for path, value in paths.items():
+        if path in staged:
+            a, b = _increment(staged[path]), _increment(value)
+            if a is None or b is None:
+                return False
+            staged[path] = {".sv": {"increment": a + b}}
+        elif any(is_under(path, other) or is_under(other, path) for other in staged):
+            return False
+        else:
+            staged[path] = value
+    merged.clear()
+    merged.update(staged)
+    return True
+
+
+class Journal:
+    def __init__(self, db_path: str = "journal.sqlite3", batch_size: int = 25, linger: float = 0.05,
+                 max_backoff: float = 30.0, max_failures: int = 10):
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self._failures = {}  # op id -> failed flushes in a row while storage was healthy
+        self._isolate = 0    # ops left to replay one at a time after a batch was refused
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ops ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, op_key TEXT UNIQUE NOT NULL, barber_id TEXT NOT NULL,"
+            " kind TEXT NOT NULL, payload TEXT NOT NULL, created_at TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL DEFAULT 'pending', error TEXT)"
+        )
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # id -> op, in append order; mirrors status='pending' rows
+        self.revision = 0   # bumped whenever the pending set changes (see LiveQueue)
+        for row in self._conn.execute("SELECT * FROM ops WHERE status = 'pending' ORDER BY id").fetchall():
+            self._pending[row[0]] = self._op(row)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _op(row) -> dict:
+        op_id, op_key, barber_id, kind, payload, created_at, attempts, status, error = row
+        return {"id": op_id, "op_key": op_key, "barber_id": barber_id, "kind": kind,
+                "payload": json.loads(payload), "created_at": created_at, "attempts": attempts,
+                "status": status, "error": error}
+
+    # --- Appending ---
+    def append(self, barber_id: str, kind: str, op_key: str, payload: dict) -> bool:
+        """Durably record an operation. False if `op_key` was journaled before (nothing added)."""
+        created_at = datetime.now(LONDON).isoformat()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO ops (op_key, barber_id, kind, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (op_key, barber_id, kind, json.dumps(payload), created_at),
+            )
+            if not cur.rowcount:
+                return False
+            self.revision += 1
+            self._pending[cur.lastrowid] = {
+                "id": cur.lastrowid, "op_key": op_key, "barber_id": barber_id, "kind": kind,
+                "payload": payload, "created_at": created_at, "attempts": 0, "status": "pending", "error": None,
+            }
+        self._wake.set()
+        return True
+
+    # --- Reading ---
+    def pending(self, barber_id: str = None) -> list:
+        with self._lock:
+            return [op for op in self._pending.values() if barber_id in (None, op["barber_id"])]
+
+    def pending_paths(self, prefix: str) -> list:
+        """(path relative to `prefix`, value) for pending writes below it, oldest first."""
+        prefix = join(prefix)
+        changes = []
+        for op in self.pending():
+            if op["kind"] == "update":
+                paths = op["payload"]["paths"]
+            else:  # a booking lands in its day's partition
+                booking = op["payload"]["booking"]
+                paths = {op["payload"]["path"]: booking}
+            for path, value in paths.items():
+                if path != prefix and is_under(path, prefix) and _increment(value) is None:
+                    changes.append((path[len(prefix) + 1:], value))
+        return changes
+
+    def conflicts(self, barber_id: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM ops WHERE barber_id = ? AND status = 'conflict' ORDER BY id", (barber_id,)
+            ).fetchall()
+        return [self._op(row) for row in rows]
+
+    def dismiss(self, op_id: int) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM ops WHERE id = ? AND status = 'conflict'", (op_id,))
+
+    # --- Flushing ---
+    @staticmethod
+    def _marker(op: dict) -> str:
+        return f"barbers/{op['barber_id']}/journal/{op['created_at'][:10]}/{op['op_key']}"
+
+    def _mark_attempt(self, ops: list) -> None:
+        with self._lock:
+            for op in ops:
+                op["attempts"] += 1
+            self._conn.executemany("UPDATE ops SET attempts = attempts + 1 WHERE id = ?", [(op["id"],) for op in ops])
+
+    def _finish(self, op: dict, error: str = None) -> None:
+        """Landed ops are deleted; conflicts are kept (status 'conflict') for the Admin Panel."""
+        with self._lock:
+            self._pending.pop(op["id"], None)
+            self._failures.pop(op["id"], None)
+            self._isolate = max(0, self._isolate - 1)
+            self.revision += 1
+            if error is None:
+                self._conn.execute("DELETE FROM ops WHERE id = ?", (op["id"],))
+            else:
+                log.warning("Journal op %s (%s) not applied: %s", op["op_key"], op["kind"], error)
+                self._conn.execute("UPDATE ops SET status = 'conflict', error = ? WHERE id = ?", (error, op["id"]))
+
+    def _landed(self, op: dict) -> None:
+        """Follow-up steps once an op's write is in (safe to repeat), then drop it."""
+        from utils.availability import mark_booking
+        from utils.bookings import release_slot
+
+        for key, slot in op["payload"].get("release", []):
+            if release_slot(op["barber_id"], key, slot):
+                mark_booking(op["barber_id"], slot, op["payload"].get("settings"), booked=False)
+        self._finish(op)
+
+    def _apply_booking(self, op: dict) -> None:
+        from utils.availability import mark_booking
+        from utils.bookings import SlotTakenError, claim_slot, reserve_booking
+
+        payload = op["payload"]
+        if reference(payload["path"]).get(shallow=True) is not None:
+            # Written by the page's own attempt, which timed out before it heard back and
+            # may have dropped its claim on the way out: take the slot back before finishing
+            try:
+                claim_slot(op["barber_id"], op["op_key"], payload["booking"])
+            except SlotTakenError:
+                self._finish(op, "Booked, but another booking has since claimed the same slot. "
+                                 "Please contact the customer.")
+                return
+            mark_booking(op["barber_id"], payload["booking"]["slot"], payload.get("settings"))
+            self._finish(op)
+            return
+        self._mark_attempt([op])
+        try:
+            reserve_booking(op["barber_id"], payload["booking"], settings=payload.get("settings"),
+                            key=op["op_key"], extra_paths={self._marker(op): {".sv": "timestamp"}})
+        except SlotTakenError:
+            self._finish(op, "The slot was taken before this booking could be placed.")
+        else:
+            self._finish(op)
+
+    @staticmethod
+    def _refused(error: Exception) -> bool:
+        """The database answered and turned the write down; retrying won't change that."""
+        return not get_storage().is_outage(error)
+
+    def flush_once(self) -> int:
+        """Replay the oldest pending operations; returns how many were settled (landed or conflict)."""
+        with self._flush_lock:
+            settled, batch, merged = 0, [], {}
+            for op in self.pending()[:1 if self._isolate else self.batch_size]:
+                try:
+                    if op["attempts"] and reference(self._marker(op)).get(shallow=True) is not None:
+                        self._landed(op)  # landed on an earlier attempt
+                        settled += 1
+                        continue
+                    if op["kind"] == "booking":
+                        if batch:
+                            break  # placed on its own, after the batch ahead of it
+                        self._apply_booking(op)
+                        return settled + 1
+                    payload = op["payload"]
+                    requires = payload.get("requires", [])
+                    if any(path in merged for path in requires):
+                        break  # written by an op ahead of it in this batch: check once that has landed
+                    if any(reference(path).get(shallow=True) is None for path in requires):
+                        self._finish(op, "Already served or removed on another screen; nothing was written.")
+                        settled += 1
+                        continue
+                except Exception as e:
+                    if not self._refused(e):
+                        raise
+                    self._finish(op, f"Refused by the database: {e}")
+                    settled += 1
+                    continue
+                if not merge_paths(merged, {**payload["paths"], self._marker(op): {".sv": "timestamp"}}):
+                    break
+                batch.append(op)
+
+            if batch:
+                self._mark_attempt(batch)
+                try:
+                    reference().update(merged)
+                except Exception as e:
+                    if not self._refused(e):
+                        raise
+                    if len(batch) > 1:
+                        self._isolate = len(batch)  # one at a time, to find the op it refuses
+                        return settled
+                    self._finish(batch[0], f"Refused by the database: {e}")
+                    return settled + 1
+                for op in batch:
+                    self._landed(op)
+                settled += len(batch)
+            return settled
+
+    def _failed(self, error: Exception) -> None:
+        """
+        Count a failed flush against the oldest pending op, unless storage as a whole is
+        down (breaker not closed): an op that keeps failing on its own is set aside.
+        """
+        with self._lock:
+            op = next(iter(self._pending.values()), None)
+            if op is None:
+                return
+            op["error"] = repr(error)
+            self._conn.execute("UPDATE ops SET error = ? WHERE id = ?", (op["error"], op["id"]))
+            if get_storage().degraded:
+                return
+            failures = self._failures[op["id"]] = self._failures.get(op["id"], 0) + 1
+        if failures >= self.max_failures:
+            self._finish(op, f"Gave up after {failures} failed attempts: {error}")
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while not self._stop.is_set():
+            if backoff:
+                self._stop.wait(backoff)  # appends don't cut a backoff short
+            elif not self._pending:
+                self._wake.wait()
+            self._wake.clear()
+            if self._stop.wait(self.linger):  # let a burst of joins share one write
+                return
+            try:
+                while self._pending and self.flush_once():
+                    pass
+            except StorageUnavailable as e:
+                backoff = min(self.max_backoff, max(1.0, backoff * 2))
+                log.info("Journal flush postponed %.0fs: %s", backoff, e)
+                self._failed(e)
+            except Exception as e:
+                backoff = min(self.max_backoff, max(1.0, backoff * 2))
+                log.exception("Journal flush failed, retrying in %.0fs", backoff)
+                self._failed(e)
+            else:
+                backoff = 0.0
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self._conn.close()
+
+
+def prune_markers(barber_id: str, before, dry_run: bool = False) -> list:
+    """Delete a barber's replay markers for days before `before` (a date); returns those days."""
+    days = sorted(
+        day for day in (reference(f"barbers/{barber_id}/journal").get(shallow=True) or {})
+        if day < before.isoformat()
+    )
+    if days and not dry_run:
+        reference(f"barbers/{barber_id}/journal").update({day: None for day in days})
+    return days
+
+
+def get_journal() -> Journal:
+    """The process-wide journal (`journal_path` in secrets, default journal.sqlite3)."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                _journal = Journal(secret("journal_path", "journal.sqlite3"))
+    return _journal
+
+
+def set_journal(journal: Journal) -> None:
+    """Use `journal` for this process (benchmarks and load tests)."""
+    global _journal
+    with _journal_lock:
+        _journal = journal
@@ -0,0 +1,230 @@
+# utils/live.py
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import streamlit as st
+
+from utils.bookings import booking_day, bookings_ref, get_legacy_bookings_between
+from utils.instrumentation import span
+from utils.journal import get_journal
+from utils.scheduling import LONDON, BarberSchedule
+from utils.storage import reference
+
+log = logging.getLogger(__name__)
+
+# What LiveQueue.view() hands out. Shared between sessions: treat as read-only.
+QueueView = namedtuple("QueueView", "walkins bookings queue stale")
+
+
+def _with_value(tree: dict, parts: list, value) -> dict:
+    """
+    Copy of `tree` with `value` written at `parts` (None deletes). Only the dicts along
+    the path are copied, so snapshots already handed out are never changed underneath a reader.
+    """
+    tree = dict(tree) if isinstance(tree, dict) else {}
+    head, rest = parts[0], parts[1:]
+    if rest:
+        child = _with_value(tree.get(head), rest, value)
+        if child:
+            tree[head] = child
+        else:
+            tree.pop(head, None)
+    elif value is None:
+        tree.pop(head, None)
+    else:
+        tree[head] = value
+    return tree
+
+
+def apply_event(tree: dict, event_type: str, path: str, data) -> dict:
+    """Apply one streamed `put`/`patch` event to a snapshot and return the new snapshot."""
+    parts = [p for p in path.split("/") if p]
+    if event_type == "put":
+        if not parts:
+            return data if isinstance(data, dict) else {}
+        return _with_value(tree, parts, data)
+    if event_type == "patch":
+        for key, value in (data or {}).items():
+            tree = _with_value(tree, parts + [p for p in key.split("/") if p], value)
+    return tree
+
+
+class BarberFeed:
+    """
+    One streaming listener per barber, shared by every session in the process.
+
+    Firebase pushes deltas for `barbers/{id}/walkins` and today's bookings partition;
+    they are applied to an in-memory snapshot that pages read instead of downloading
+    the nodes each rerun. The bookings listener moves to the new partition at midnight.
+    """
+
+    def __init__(self, barber_id: str):
+        self.barber_id = barber_id
+        self.day = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._roll_lock = threading.Lock()
+        self._data = {}
+        self._ready = {}
+        self._registrations = {}
+        self._paths = {}
+        self._legacy = {}  # today's not-yet-migrated flat bookings
+        self._listen("walkins", f"barbers/{barber_id}/walkins")
+        self._roll_day()
+
+    def _listen(self, node: str, path: str) -> None:
+        old = self._registrations.pop(node, None)
+        if old is not None:
+            old.close()
+        with self._lock:
+            self._data[node] = {}
+            self._ready[node] = threading.Event()
+            self._paths[node] = path
+        self._registrations[node] = reference(path).listen(
+            lambda event, node=node: self._on_event(node, event)
+        )
+
+    def _roll_day(self) -> None:
+        today = datetime.now(LONDON).date()
+        if today == self.day:
+            return
+        with self._roll_lock:
+            if today == self.day:
+                return
+            self._legacy = get_legacy_bookings_between(self.barber_id, today, today)
+            self._listen("bookings", bookings_ref(self.barber_id, today.isoformat()).path)
+            self.day = today
+
+    def _on_event(self, node: str, event) -> None:
+        self._apply(node, event.event_type, event.path, event.data)
+        self._ready[node].set()
+
+    def _apply(self, node: str, event_type: str, path: str, data) -> None:
+        with self._lock:
+            self._data[node] = apply_event(self._data[node], event_type, path, data)
+            self.version += 1
+
+    def apply_local(self, node: str, key: str, value) -> None:
+        """Reflect our own write straight away; the echoed server event is then a no-op."""
+        if node == "bookings":
+            if value is None:
+                self._legacy.pop(key, None)
+            elif booking_day(value["slot"]) != str(self.day):
+                return  # not today's partition, nothing to show
+        self._apply(node, "put", f"/{key}", value)
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Whether both nodes have had their first event, waiting up to `timeout` seconds in all."""
+        self._roll_day()
+        deadline = time.monotonic() + timeout
+        return all(
+            self._ready[node].wait(max(0.0, deadline - time.monotonic())) for node in ("walkins", "bookings")
+        )
+
+    def snapshot(self, node: str, timeout: float = 10.0) -> dict:
+        """
+        Current contents of `node`, with journaled writes that haven't reached the database
+        yet laid over it. Treat as read-only: it is shared between sessions.
+        """
+        if node == "bookings":
+            self._roll_day()
+        if not self._ready[node].wait(timeout):
+            raise TimeoutError(f"No data from Firebase for barbers/{self.barber_id}/{node} yet.")
+        with self._lock:
+            data, path = self._data[node], self._paths[node]
+        for relative, value in get_journal().pending_paths(path):
+            data = _with_value(data, [p for p in relative.split("/") if p], value)
+        if node == "bookings" and self._legacy:
+            return {**self._legacy, **data}
+        return data
+
+    @property
+    def alive(self) -> bool:
+        return all(reg.alive for reg in self._registrations.values())
+
+    def close(self) -> None:
+        for reg in self._registrations.values():
+            reg.close()
+
+
+@st.cache_resource(show_spinner=False, validate=lambda feed: feed.alive)
+def get_feed(barber_id: str) -> BarberFeed:
+    """The process-wide live feed for a barber (restarted if its listener thread has died)."""
+    return BarberFeed(barber_id)
+
+
+# How long a view waits for a new listener's first data before showing the last queue
+READY_TIMEOUT = 1.0
+
+
+class LiveQueue:
+    """
+    One barber's computed queue, shared by every session in the process.
+
+    The schedule is only brought up to date when its data stamp changes: the feed (and its
+    version and day), the journal's revision, or the minute walk-ins are placed from. Every
+    other viewer in between gets the queue already computed, so the work per refresh grows
+    with the number of barbers rather than the number of open screens.
+    """
+
+    def __init__(self, barber_id: str, avg_cut_duration: int):
+        self.barber_id = barber_id
+        self.avg_cut_duration = avg_cut_duration
+        self._schedule = BarberSchedule(avg_cut_duration)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._view = QueueView({}, {}, (), True)
+
+    def view(self, start: datetime) -> QueueView:
+        """
+        The queue with walk-ins placed from `start` (usually max(now, open_time)). If the
+        feed can't be read, or hasn't had its first data within READY_TIMEOUT, the last
+        queue seen is placed from `start` instead (stale=True) rather than waiting on it.
+        """
+        start = start.replace(second=0, microsecond=0)
+        # Wait for the listener outside the lock: every screen for this barber shares it
+        try:
+            feed = get_feed(self.barber_id)
+            ready = feed.wait_ready(READY_TIMEOUT)
+        except Exception as e:
+            log.debug("Live feed for %s unavailable: %r", self.barber_id, e)
+            feed, ready = None, False
+
+        with self._lock:
+            stamp, walkins, bookings = None, None, None
+            if ready:
+                try:
+                    stamp = (id(feed), feed.day, feed.version, get_journal().revision, start)
+                    if stamp == self._stamp:
+                        return self._view
+                    walkins = feed.snapshot("walkins", timeout=0)
+                    bookings = feed.snapshot("bookings", timeout=0)  # today's partition only
+                except Exception as e:
+                    log.debug("Live queue for %s not refreshed: %r", self.barber_id, e)
+                    stamp = None
+
+            with span("queue.build"):
+                if stamp is not None:
+                    self._schedule.sync(walkins, bookings)
+                self._schedule.set_start(start)
+                queue = tuple(self._schedule.queue())
+            if stamp is None:  # keep joins made meanwhile (add_walkin), don't sync back to old data
+                self._view = self._view._replace(queue=queue, stale=True)
+            else:
+                self._view = QueueView(walkins, bookings, queue, False)
+            self._stamp = stamp
+            return self._view
+
+    def add_walkin(self, key: str, record: dict) -> tuple:
+        """Place a walk-in that just joined; returns its (position, estimated start). Call view() first."""
+        with self._lock:
+            return self._schedule.add_walkin(key, record)
+
+
+@st.cache_resource(show_spinner=False)
+def get_live_queue(barber_id: str, avg_cut_duration: int) -> LiveQueue:
+    """The process-wide computed queue for a barber (see LiveQueue)."""
+    return LiveQueue(barber_id, avg_cut_duration)
@@ -0,0 +1,50 @@
+# utils/rollups.py
+"""
+Dashboard counters maintained at write time, so the Dashboard reads a few hundred
+numbers instead of regrouping the raw logs on every view.
+
+`barbers/{id}/stats`:
+    daily/{YYYY-MM-DD}/{source}       - people per day
+    weekday_hour/{Mon_10}/{source}    - people per weekday and hour (non-numeric keys, so
+                                        Firebase never turns the node into a list)
+    totals/{source}                   - all-time count
+    version                           - bumped on every change; cache key for the Dashboard
+
+Counters are server-side increments, so concurrent kiosks never lose a count.
+"""
+from utils.scheduling import parse_time
+from utils.storage import reference
+
+SOURCES = ("walkin", "booking")
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _increment(delta: int) -> dict:
+    return {".sv": {"increment": delta}}
+
+
+def weekday_hour_key(moment) -> str:
+    return f"{DAYS[moment.weekday()]}_{moment.hour:02d}"
+
+
+def rollup_paths(barber_id: str, moment, source: str, delta: int = 1) -> dict:
+    """
+    Multi-path increments for one walk-in or booking at `moment` (a datetime or ISO string).
+    Returned rather than written, so callers can fold them into their own atomic update.
+    """
+    moment = parse_time(moment) if isinstance(moment, str) else moment
+    base = f"barbers/{barber_id}/stats"
+    return {
+        f"{base}/daily/{moment.date().isoformat()}/{source}": _increment(delta),
+        f"{base}/weekday_hour/{weekday_hour_key(moment)}/{source}": _increment(delta),
+        f"{base}/totals/{source}": _increment(delta),
+        f"{base}/version": _increment(1),
+    }
+
+
+def load_stats(barber_id: str) -> dict:
+    return reference(f"barbers/{barber_id}/stats").get() or {}
+
+
+def stats_version(barber_id: str) -> int:
+    return int(reference(f"barbers/{barber_id}/stats/version").get() or 0)
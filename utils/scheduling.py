@@ -0,0 +1,273 @@
+# utils/scheduling.py
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+LONDON = ZoneInfo("Europe/London")
+
+
+def parse_time(value, tz=LONDON):
+    """Parse an ISO timestamp from Firebase into an aware datetime (naive values are shop-local)."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=tz)
+    return dt.astimezone(tz)
+
+
+class BusySlots:
+    """
+    Occupied time on a barber's chair, kept as sorted, merged [start, end) intervals.
+
+    Lookups are a bisect over the interval starts, so checking or skipping past a
+    busy block costs O(log n) instead of scanning every booking.
+    """
+
+    def __init__(self):
+        self._starts = []
+        self._ends = []
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """Mark [start, end) as busy, merging with any overlapping or touching intervals."""
+        lo = bisect_left(self._ends, start)      # first interval that ends at/after start
+        hi = bisect_right(self._starts, end)     # intervals from here start after end
+        if lo < hi:
+            start = min(start, self._starts[lo])
+            end = max(end, self._ends[hi - 1])
+        self._starts[lo:hi] = [start]
+        self._ends[lo:hi] = [end]
+
+    def covering(self, moment: datetime) -> int:
+        """Index of the interval containing `moment`, or -1 if the chair is free then."""
+        i = bisect_right(self._starts, moment) - 1
+        if i >= 0 and moment < self._ends[i]:
+            return i
+        return -1
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        """True if any busy interval intersects [start, end)."""
+        i = bisect_right(self._ends, start)      # first interval ending after start
+        return i < len(self._starts) and self._starts[i] < end
+
+    def next_free(self, moment: datetime, step: timedelta) -> datetime:
+        """
+        Earliest time reachable from `moment` in whole `step`s that is not inside a busy
+        interval. Matches the old `while any(...): t += step` loop, but jumps each block at once.
+        """
+        i = self.covering(moment)
+        while i >= 0:
+            behind = self._ends[i] - moment
+            moment += step * -(-behind // step)  # ceil to a whole number of steps
+            i = self.covering(moment)
+        return moment
+
+    def free_slots(self, open_time: datetime, close_time: datetime, step: timedelta,
+                   not_before: datetime = None) -> list:
+        """Grid slots of length `step` from open to close that don't clash with anything busy."""
+        slots = []
+        slot = open_time
+        while slot + step <= close_time:
+            if (not_before is None or slot >= not_before) and not self.overlaps(slot, slot + step):
+                slots.append(slot)
+            slot += step
+        return slots
+
+
+def place_walkins(busy: BusySlots, count: int, start: datetime, duration: timedelta) -> list:
+    """Give `count` walk-ins back-to-back start times from `start`, skipping around busy time."""
+    starts = []
+    cursor = start
+    for _ in range(count):
+        cursor = busy.next_free(cursor, duration)
+        starts.append(cursor)
+        cursor += duration
+    return starts
+
+
+class BarberSchedule:
+    """
+    One barber's live queue, maintained in place between reruns.
+
+    Bookings are a sorted list of start times (every cut lasts the same time, so the latest
+    booking starting at or before t is the only one that can cover t). Walk-ins are kept in
+    join order with their estimated starts computed lazily: a change only invalidates the
+    walk-ins from the affected position onwards, so a join at the back of the queue is a
+    bisect plus one placement rather than a rebuild of the day.
+
+    Finding an entry's place is a bisect, O(log n), but inserting, removing or moving it
+    shifts a plain list, so those are O(n). That is a memmove of a day's queue (tens of
+    entries), cheaper in practice than a sorted container.
+    """
+
+    def __init__(self, avg_cut_duration: int):
+        self.avg_cut_duration = avg_cut_duration
+        self._duration = timedelta(minutes=avg_cut_duration)
+        self._start = None            # walk-ins are placed from here (minute resolution)
+
+        self._booking_starts = []     # sorted datetimes
+        self._booking_order = []      # (start, key), same order as _booking_starts
+        self._bookings = {}           # key -> record
+
+        self._walkin_order = []       # (joined_at, key), join order
+        self._walkins = {}            # key -> record
+        self._etas = []               # estimated starts for _walkin_order[:len(_etas)]
+
+    # --- Placement ---
+    def set_start(self, moment: datetime) -> None:
+        """Walk-ins start being seen from `moment` (usually max(now, open_time))."""
+        moment = moment.replace(second=0, microsecond=0)
+        if moment != self._start:
+            self._start = moment
+            self._etas.clear()
+
+    def _covering_end(self, moment: datetime):
+        i = bisect_right(self._booking_starts, moment) - 1
+        if i >= 0 and moment < self._booking_starts[i] + self._duration:
+            return self._booking_starts[i] + self._duration
+        return None
+
+    def _next_free(self, moment: datetime) -> datetime:
+        end = self._covering_end(moment)
+        while end is not None:
+            moment += self._duration * -(-(end - moment) // self._duration)
+            end = self._covering_end(moment)
+        return moment
+
+    def _place_until(self, index: int) -> None:
+        if self._start is None:
+            raise RuntimeError("Call set_start() before reading walk-in ETAs.")
+        cursor = self._etas[-1] + self._duration if self._etas else self._start
+        while len(self._etas) <= index:
+            cursor = self._next_free(cursor)
+            self._etas.append(cursor)
+            cursor += self._duration
+
+    def _invalidate_from(self, index: int) -> None:
+        del self._etas[index:]
+
+    def _invalidate_after_booking(self, start: datetime) -> None:
+        # Only walk-ins placed at or after the booking could have been steered by it.
+        self._invalidate_from(bisect_left(self._etas, start))
+
+    # --- Walk-ins ---
+    def add_walkin(self, key: str, record: dict) -> tuple:
+        """Insert a walk-in and return its (position, estimated start) in the combined queue."""
+        return self._locate_walkin(self._insert_walkin(key, record))
+
+    def _insert_walkin(self, key: str, record: dict) -> int:
+        if key in self._walkins:
+            self.remove(key)
+        item = (record["joined_at"], key)
+        index = bisect_right(self._walkin_order, item)
+        self._walkin_order.insert(index, item)
+        self._walkins[key] = record
+        self._invalidate_from(index)
+        return index
+
+    def _locate_walkin(self, index: int) -> tuple:
+        self._place_until(index)
+        start = self._etas[index]
+        return index + 1 + bisect_left(self._booking_starts, start), start
+
+    def position(self, key: str) -> tuple:
+        """(position, estimated start) of a queued walk-in or booking."""
+        if key in self._walkins:
+            index = bisect_left(self._walkin_order, (self._walkins[key]["joined_at"], key))
+            return self._locate_walkin(index)
+        start = parse_time(self._bookings[key]["slot"])
+        walkins_before = 0
+        if self._walkin_order:
+            self._place_until(len(self._walkin_order) - 1)
+            walkins_before = bisect_right(self._etas, start)
+        return walkins_before + 1 + bisect_left(self._booking_order, (start, key)), start
+
+    # --- Bookings ---
+    def add_booking(self, key: str, record: dict) -> tuple:
+        """Insert a booking and return its (position, start) in the combined queue."""
+        self._insert_booking(key, record)
+        return self.position(key)
+
+    def _insert_booking(self, key: str, record: dict) -> None:
+        if key in self._bookings:
+            self.remove(key)
+        start = parse_time(record.get("slot"))
+        if start is None:
+            raise ValueError(f"Booking {key} has no valid slot.")
+        index = bisect_right(self._booking_order, (start, key))
+        self._booking_order.insert(index, (start, key))
+        self._booking_starts.insert(index, start)
+        self._bookings[key] = record
+        self._invalidate_after_booking(start)
+
+    # --- Shared ---
+    def remove(self, key: str) -> None:
+        """Drop a walk-in or booking (e.g. when the admin marks it done)."""
+        if key in self._walkins:
+            index = bisect_left(self._walkin_order, (self._walkins.pop(key)["joined_at"], key))
+            del self._walkin_order[index]
+            self._invalidate_from(index)
+        elif key in self._bookings:
+            start = parse_time(self._bookings.pop(key)["slot"])
+            index = bisect_left(self._booking_order, (start, key))
+            del self._booking_order[index]
+            del self._booking_starts[index]
+            self._invalidate_after_booking(start)
+
+    def reposition(self, key: str, *, joined_at: str = None, slot: str = None) -> tuple:
+        """Move a walk-in to a new place in the line (`joined_at`) or a booking to a new `slot`; returns its (position, start)."""
+        if key in self._walkins:
+            if joined_at is None:
+                raise ValueError(f"Moving walk-in {key} needs a joined_at.")
+            return self.add_walkin(key, {**self._walkins[key], "joined_at": joined_at})
+        if key in self._bookings:
+            if slot is None:
+                raise ValueError(f"Moving booking {key} needs a slot.")
+            return self.add_booking(key, {**self._bookings[key], "slot": slot})
+        raise KeyError(key)
+
+    def sync(self, walkins: dict, bookings: dict) -> None:
+        """Apply only the differences between the maintained state and a fresh snapshot."""
+        walkins = {k: v for k, v in (walkins or {}).items() if isinstance(v, dict) and "joined_at" in v}
+        bookings = {k: v for k, v in (bookings or {}).items()
+                    if isinstance(v, dict) and parse_time(v.get("slot")) is not None}
+
+        for key in [k for k in self._walkins if k not in walkins]:
+            self.remove(key)
+        for key in [k for k in self._bookings if k not in bookings]:
+            self.remove(key)
+        for key, record in walkins.items():
+            if self._walkins.get(key) != record:
+                self._insert_walkin(key, record)
+        for key, record in bookings.items():
+            if self._bookings.get(key) != record:
+                self._insert_booking(key, record)
+
+    def walkin_starts(self) -> list:
+        """Estimated start of every queued walk-in, in join order."""
+        if self._walkin_order:
+            self._place_until(len(self._walkin_order) - 1)
+        return list(self._etas)
+
+    def queue(self) -> list:
+        """The combined queue as dicts with key, name, source and start, ordered by start."""
+        walkins = [
+            {"key": key, "name": self._walkins[key].get("name", ""), "source": "walkin", "start": start}
+            for (_, key), start in zip(self._walkin_order, self.walkin_starts())
+        ]
+        bookings = [
+            {"key": key, "name": self._bookings[key].get("name", ""), "source": "booking", "start": start}
+            for start, key in self._booking_order
+        ]
+        return list(merge(walkins, bookings, key=lambda x: x["start"]))
+
+    def __len__(self):
+        return len(self._walkins) + len(self._bookings)
@@ -0,0 +1,11 @@
+# utils/secrets.py
+import streamlit as st
+from streamlit.errors import StreamlitSecretNotFoundError
+
+
+def secret(name: str, default=None):
+    """st.secrets[name], or `default` if it is unset or there is no secrets file (scripts, benchmarks)."""
+    try:
+        return st.secrets.get(name, default)
+    except (FileNotFoundError, StreamlitSecretNotFoundError):
+        return default
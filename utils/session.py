@@ -1,6 +1,7 @@
 # utils/session.py
 # utils/session.py
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 BARBER_KEY = "barber_id"
 
@@ -27,4 +28,13 @@ def get_barber_id(default: str = "default_barber") -> str:
 
     # Fallback to default
     set_barber_id(default)  # Set default to session
-    return default
\ No newline at end of file
+    return default
+
+
+def rerun_fragment() -> None:
+    """
+    Rerun just the fragment this is called from when it is rerunning on its own (a click
+    inside it), or the whole page when the click arrived with a full rerun.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
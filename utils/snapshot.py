@@ -0,0 +1,87 @@
+# utils/snapshot.py
+"""
+Everything a page reads about one barber at the top of a rerun, fetched in one go.
+
+    snap = load_barber_snapshot(barber_id, parts=("settings", "walkins", "stats_version"))
+    snap.settings, snap["walkins"]
+
+The requested parts are de-duplicated and read concurrently on a shared thread pool,
+so a rerun waits for the slowest read rather than the sum of them. Parts that are
+already cached (settings) come back without a round trip. Part loaders run off the
+script thread, so they must only touch storage and caches, never `st.*`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+from utils.bookings import count_bookings_between
+from utils.firebase_utils import get_barber_config
+from utils.instrumentation import attach_trace, current_trace, span
+from utils.rollups import stats_version
+from utils.scheduling import LONDON
+from utils.storage import reference
+
+_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="barber-snapshot")
+
+
+def _upcoming_count(barber_id: str) -> int:
+    today = datetime.now(LONDON).date()
+    return count_bookings_between(barber_id, today, today + timedelta(days=365))
+
+
+PARTS = {
+    "settings": get_barber_config,
+    "admin_pin": lambda barber_id: reference(f"barbers/{barber_id}/config/admin_pin").get(),
+    "walkins": lambda barber_id: reference(f"barbers/{barber_id}/walkins").get() or {},
+    "upcoming_count": _upcoming_count,
+    "stats_version": stats_version,
+}
+
+
+class BarberSnapshot:
+    """Read-only view of the parts loaded for one rerun (attribute or key access)."""
+
+    def __init__(self, barber_id: str, values: dict):
+        self.barber_id = barber_id
+        self._values = MappingProxyType(values)
+
+    def __getitem__(self, part: str):
+        return self._values[part]
+
+    def __getattr__(self, part: str):
+        try:
+            return self._values[part]
+        except KeyError:
+            raise AttributeError(f"Snapshot has no part {part!r} (not requested?)") from None
+
+    def __contains__(self, part: str) -> bool:
+        return part in self._values
+
+    def __setattr__(self, name, value):
+        if "_values" in self.__dict__:
+            raise AttributeError("BarberSnapshot is read-only")
+        super().__setattr__(name, value)
+
+    def __repr__(self):
+        return f"BarberSnapshot({self.barber_id!r}, parts={list(self._values)})"
+
+
+def load_barber_snapshot(barber_id: str, parts=("settings",)) -> BarberSnapshot:
+    """Fetch `parts` (names from PARTS) concurrently; the first failing read is re-raised."""
+    unknown = set(parts) - set(PARTS)
+    if unknown:
+        raise ValueError(f"Unknown snapshot parts: {sorted(unknown)}")
+    parts = list(dict.fromkeys(parts))
+
+    with span("snapshot.load"):
+        if len(parts) == 1:
+            return BarberSnapshot(barber_id, {parts[0]: PARTS[parts[0]](barber_id)})
+
+        trace = current_trace()
+
+        def load(part):
+            with attach_trace(trace), span(f"snapshot.{part}"):
+                return PARTS[part](barber_id)
+
+        futures = {part: _pool.submit(load, part) for part in parts}
+        return BarberSnapshot(barber_id, {part: future.result() for part, future in futures.items()})
@@ -0,0 +1,75 @@
+# utils/storage/__init__.py
+"""
+Storage backends behind one interface, picked by `storage_backend` in secrets:
+
+    storage_backend = "firebase"   # default: firebase_creds + firebase_db_url
+    storage_backend = "sqlite"     # sqlite_path (default queue.sqlite3)
+    storage_backend = "memory"     # offline runs, demos, load tests
+
+Code reads and writes through `reference(path)`, which behaves like `firebase_admin.db.reference`.
+Every call has a deadline, retries and a circuit breaker (utils/storage/resilient.py,
+tuned with `storage_deadline`, `storage_retries`, `storage_breaker_failures` and
+`storage_breaker_cooldown`) and is timed as a `storage.*` span (utils/instrumentation.py).
+"""
+import threading
+
+from utils.secrets import secret
+from utils.storage.base import PUSH_CHARS, Event, QueryError, Reference, Storage, StorageUnavailable, new_push_key
+from utils.storage.instrumented import InstrumentedStorage
+from utils.storage.resilient import ResilientStorage
+
+_storage = None
+_lock = threading.Lock()
+
+
+def create_storage(backend: str, **options) -> Storage:
+    if backend == "firebase":
+        from utils.storage.firebase import FirebaseStorage
+        return FirebaseStorage(
+            options["firebase_creds"], options["firebase_db_url"],
+            timeout=float(options.get("firebase_http_timeout", 10)),
+            pool_size=int(options.get("firebase_pool_size", 32)),
+        )
+    if backend == "sqlite":
+        from utils.storage.sqlite import SQLiteStorage
+        return SQLiteStorage(options.get("sqlite_path", "queue.sqlite3"))
+    if backend == "memory":
+        from utils.storage.memory import MemoryStorage
+        return MemoryStorage(options.get("data"))
+    raise ValueError(f"Unknown storage backend {backend!r}")
+
+
+def get_storage() -> Storage:
+    """The process-wide backend, created from secrets on first use."""
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                names = ("firebase_creds", "firebase_db_url", "firebase_http_timeout", "firebase_pool_size", "sqlite_path")
+                options = {name: secret(name) for name in names if secret(name) is not None}
+                backend = ResilientStorage(
+                    create_storage(secret("storage_backend", "firebase"), **options),
+                    deadline=float(secret("storage_deadline", 5)),
+                    retries=int(secret("storage_retries", 2)),
+                    failures=int(secret("storage_breaker_failures", 5)),
+                    cooldown=float(secret("storage_breaker_cooldown", 30)),
+                )
+                _storage = InstrumentedStorage(backend)
+    return _storage
+
+
+def set_storage(storage: Storage) -> None:
+    """Use `storage` for this process (scripts, benchmarks and load tests)."""
+    global _storage
+    with _lock:
+        _storage = storage
+
+
+def reference(path: str = "") -> Reference:
+    return get_storage().reference(path)
+
+
+__all__ = [
+    "PUSH_CHARS", "Event", "QueryError", "Reference", "Storage", "StorageUnavailable",
+    "create_storage", "get_storage", "new_push_key", "reference", "set_storage",
+]
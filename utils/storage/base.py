@@ -0,0 +1,332 @@
+# utils/storage/base.py
+"""
+The storage interface every page and util goes through.
+
+A backend implements a handful of primitives on slash-separated paths (read, atomic
+multi-path write, listen). `Reference` and `Query` on top give the same call style as
+`firebase_admin.db` (`reference(path).child(...).get()`, `.order_by_key().start_at(...)`),
+so the Firebase adapter is a thin pass-through and the local adapters behave alike:
+None deletes, empty nodes disappear, `{".sv": ...}` server values are resolved on write,
+and listeners receive `put` events with paths relative to where they listen.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from collections import namedtuple
+
+log = logging.getLogger(__name__)
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+Event = namedtuple("Event", "event_type path data")
+
+
+class QueryError(Exception):
+    """The backend can't run this query (e.g. Firebase without the index it needs)."""
+
+
+class StorageUnavailable(Exception):
+    """The backend didn't answer in time (or is cut off by the circuit breaker) and there is no fallback."""
+
+
+def new_push_key() -> str:
+    """
+    A Firebase-style push key generated locally (8 chars of millisecond time + 12 random),
+    so a record's key is known before it is written and can go into a multi-path update.
+    """
+    millis = int(time.time() * 1000)
+    stamp = []
+    for _ in range(8):
+        millis, i = divmod(millis, 64)
+        stamp.append(PUSH_CHARS[i])
+    return "".join(reversed(stamp)) + "".join(random.choices(PUSH_CHARS, k=12))
+
+
+# --- Path and value helpers ---
+def split(path: str) -> list:
+    return [p for p in str(path or "").split("/") if p]
+
+
+def join(*parts) -> str:
+    return "/".join(p for part in parts for p in split(part))
+
+
+def is_under(path: str, parent: str) -> bool:
+    """True if `path` is `parent` or lies below it."""
+    return not parent or path == parent or path.startswith(parent + "/")
+
+
+def resolve_server_values(value, current):
+    """Replace `{".sv": ...}` placeholders using the value currently stored at the same place."""
+    if isinstance(value, dict):
+        if ".sv" in value:
+            sv = value[".sv"]
+            if sv == "timestamp":
+                return int(time.time() * 1000)
+            if isinstance(sv, dict) and "increment" in sv:
+                number = isinstance(current, (int, float)) and not isinstance(current, bool)
+                return (current if number else 0) + sv["increment"]
+            raise ValueError(f"Unsupported server value {sv!r}")
+        current = current if isinstance(current, dict) else {}
+        return {key: resolve_server_values(child, current.get(key)) for key, child in value.items()}
+    return value
+
+
+def has_server_values(value) -> bool:
+    if isinstance(value, dict):
+        return ".sv" in value or any(has_server_values(v) for v in value.values())
+    return False
+
+
+def normalize(value):
+    """Stored shape of a value: lists become dicts, None and empty dicts vanish (returns None)."""
+    if isinstance(value, (list, tuple)):
+        value = {str(i): v for i, v in enumerate(value)}
+    if isinstance(value, dict):
+        pruned = {str(k): normalize(v) for k, v in value.items()}
+        pruned = {k: v for k, v in pruned.items() if v is not None}
+        return pruned or None
+    return value
+
+
+def shallow_view(value):
+    """What a shallow read returns: leaf values as-is, child objects as True."""
+    if not isinstance(value, dict):
+        return value
+    return {key: True if isinstance(child, dict) else child for key, child in value.items()}
+
+
+def query_children(children: dict, order_by: str, start_at=None, end_at=None, limit_to_first=None) -> dict:
+    """Filter and order a node's children the way a Firebase ordered query does."""
+    def sort_value(item):
+        key, child = item
+        if order_by == "$key":
+            return key
+        return child.get(order_by) if isinstance(child, dict) else None
+
+    rows = []
+    for item in (children or {}).items():
+        value = sort_value(item)
+        if value is None and order_by != "$key":
+            continue
+        try:
+            if (start_at is not None and value < start_at) or (end_at is not None and value > end_at):
+                continue
+        except TypeError:
+            continue  # mixed types never match a typed bound
+        rows.append((value, item[0], item[1]))
+
+    rows.sort(key=lambda row: (str(type(row[0])), row[0], row[1]))
+    if limit_to_first is not None:
+        rows = rows[:limit_to_first]
+    return {key: child for _, key, child in rows}
+
+
+# --- Listeners ---
+class Registration:
+    """A live listener; events are delivered in order on its own thread."""
+
+    def __init__(self, storage, path: str, callback):
+        self.path = path
+        self._storage = storage
+        self._callback = callback
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name=f"listen:{path}")
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                self._callback(event)
+            except Exception:
+                log.exception("Listener on %s failed; it has stopped.", self.path)
+                self._storage._unregister(self)
+                return
+
+    def deliver(self, event: Event) -> None:
+        self._events.put(event)
+
+    @property
+    def alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def close(self) -> None:
+        self._storage._unregister(self)
+        self._events.put(None)
+
+
+# --- Fluent references ---
+class Query:
+    def __init__(self, storage, path: str, order_by: str):
+        self._storage = storage
+        self._path = path
+        self._order_by = order_by
+        self._start = self._end = self._limit = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def limit_to_first(self, count: int):
+        self._limit = count
+        return self
+
+    def get(self) -> dict:
+        return self._storage.query(self._path, self._order_by, self._start, self._end, self._limit)
+
+
+class Reference:
+    def __init__(self, storage, path: str = ""):
+        self._storage = storage
+        self._path = join(path)
+
+    @property
+    def path(self) -> str:
+        return "/" + self._path
+
+    @property
+    def key(self):
+        parts = split(self._path)
+        return parts[-1] if parts else None
+
+    def child(self, path: str) -> "Reference":
+        return Reference(self._storage, join(self._path, path))
+
+    def get(self, shallow: bool = False):
+        return self._storage.get(self._path, shallow=shallow)
+
+    def set(self, value) -> None:
+        self._storage.set(self._path, value)
+
+    def update(self, values: dict) -> None:
+        self._storage.update(self._path, values)
+
+    def delete(self) -> None:
+        self._storage.delete(self._path)
+
+    def push(self, value="") -> "Reference":
+        return self.child(self._storage.push(self._path, value))
+
+    def transaction(self, fn):
+        return self._storage.transaction(self._path, fn)
+
+    def order_by_key(self) -> Query:
+        return Query(self._storage, self._path, "$key")
+
+    def order_by_child(self, child: str) -> Query:
+        return Query(self._storage, self._path, child)
+
+    def listen(self, callback):
+        return self._storage.listen(self._path, callback)
+
+
+# --- Backend interface ---
+class Storage:
+    """
+    Base for the local backends. Subclasses implement `_read(path)` and an atomic
+    `_write({path: value})`; everything else (multi-path updates, server values,
+    transactions, ordered queries, listeners) is shared here.
+    """
+
+    name = "base"
+    degraded = False  # True while reads are being served from the last good copy
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._registrations = []
+
+    # Primitives
+    def _read(self, path: str):
+        raise NotImplementedError
+
+    def _write(self, changes: dict) -> None:
+        """Apply {path: value} atomically (value None deletes); values are already resolved."""
+        raise NotImplementedError
+
+    def is_outage(self, error: Exception) -> bool:
+        """
+        True if `error` means the backend couldn't be reached or failed (worth retrying later),
+        False if it answered and rejected the call (bad data, permissions), which won't change.
+        """
+        return isinstance(error, (StorageUnavailable, ConnectionError, TimeoutError))
+
+    # Public API
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    def get(self, path: str, shallow: bool = False):
+        value = self._read(join(path))
+        return shallow_view(value) if shallow else value
+
+    def set(self, path: str, value) -> None:
+        self.update(path, {"": value})
+
+    def update(self, path: str, values: dict) -> None:
+        with self._lock:
+            changes = {}
+            for sub, value in values.items():
+                target = join(path, sub)
+                if has_server_values(value):
+                    value = resolve_server_values(value, self._read(target))
+                changes[target] = normalize(value)
+            self._write(changes)
+            self._changed(list(changes))
+
+    def delete(self, path: str) -> None:
+        self.set(path, None)
+
+    def push(self, path: str, value="") -> str:
+        key = new_push_key()
+        if value not in ("", None):
+            self.set(join(path, key), value)
+        return key
+
+    def transaction(self, path: str, fn):
+        """Run fn(current) -> new value atomically; exceptions from fn abort without writing."""
+        with self._lock:
+            new_value = fn(self._read(join(path)))
+            self.set(path, new_value)
+            return new_value
+
+    def query(self, path: str, order_by: str, start_at=None, end_at=None, limit_to_first=None) -> dict:
+        children = self._read(join(path))
+        return query_children(children if isinstance(children, dict) else {}, order_by,
+                              start_at, end_at, limit_to_first)
+
+    def listen(self, path: str, callback) -> Registration:
+        path = join(path)
+        with self._lock:
+            registration = Registration(self, path, callback)
+            registration.deliver(Event("put", "/", self._read(path)))
+            self._registrations.append(registration)
+        return registration
+
+    def _unregister(self, registration: Registration) -> None:
+        with self._lock:
+            if registration in self._registrations:
+                self._registrations.remove(registration)
+
+    def _changed(self, paths: list) -> None:
+        """Queue `put` events for listeners above or below the written paths (under the write lock)."""
+        for registration in list(self._registrations):
+            listened = registration.path
+            if any(is_under(listened, written) and listened != written for written in paths):
+                registration.deliver(Event("put", "/", self._read(listened)))
+                continue
+            for written in paths:
+                if is_under(written, listened):
+                    relative = "/" + written[len(listened):].lstrip("/")
+                    registration.deliver(Event("put", relative, self._read(written)))
+
+    def close(self) -> None:
+        for registration in list(self._registrations):
+            registration.close()
@@ -0,0 +1,83 @@
+# utils/storage/faulty.py
+"""
+Fault-injecting stand-in for a remote backend: wraps another backend and adds latency,
+errors, hung calls and outages, so timeouts, retries and the circuit breaker
+(utils/storage/resilient.py) can be exercised locally. See benchmarks/bench_resilience.py.
+"""
+import random
+import time
+
+from utils.storage.base import Reference, Storage
+
+
+class InjectedFault(ConnectionError):
+    pass
+
+
+class FaultyStorage(Storage):
+    def __init__(self, inner: Storage, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang: float = 30.0, seed: int = None):
+        super().__init__()
+        self.inner = inner
+        self.name = inner.name
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self._rng = random.Random(seed)
+        self._down_until = 0.0
+
+    def outage(self, seconds: float) -> None:
+        """Fail every call for the next `seconds`."""
+        self._down_until = time.monotonic() + seconds
+
+    def _fault(self) -> None:
+        if time.monotonic() < self._down_until:
+            raise InjectedFault("injected outage")
+        roll = self._rng.random()
+        if roll < self.hang_rate:
+            time.sleep(self.hang)
+        elif roll < self.hang_rate + self.error_rate:
+            raise InjectedFault("injected error")
+        time.sleep(self.latency + self._rng.uniform(0, self.jitter))
+
+    def is_outage(self, error: Exception) -> bool:
+        return self.inner.is_outage(error)
+
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    def get(self, path, shallow=False):
+        self._fault()
+        return self.inner.get(path, shallow=shallow)
+
+    def set(self, path, value):
+        self._fault()
+        self.inner.set(path, value)
+
+    def update(self, path, values):
+        self._fault()
+        self.inner.update(path, values)
+
+    def delete(self, path):
+        self._fault()
+        self.inner.delete(path)
+
+    def push(self, path, value=""):
+        self._fault()
+        return self.inner.push(path, value)
+
+    def transaction(self, path, fn):
+        self._fault()
+        return self.inner.transaction(path, fn)
+
+    def query(self, path, order_by, start_at=None, end_at=None, limit_to_first=None):
+        self._fault()
+        return self.inner.query(path, order_by, start_at, end_at, limit_to_first)
+
+    def listen(self, path, callback):
+        return self.inner.listen(path, callback)
+
+    def close(self) -> None:
+        self.inner.close()
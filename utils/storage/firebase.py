@@ -0,0 +1,98 @@
+# utils/storage/firebase.py
+"""Firebase Realtime Database backend: a pass-through to `firebase_admin.db`."""
+import json
+import logging
+
+import firebase_admin
+from firebase_admin import credentials, db, exceptions
+from requests.adapters import HTTPAdapter
+
+from utils.storage.base import QueryError, Reference, Storage, join
+
+log = logging.getLogger(__name__)
+
+
+class _FirebaseRegistration:
+    def __init__(self, registration):
+        self._registration = registration
+
+    @property
+    def alive(self) -> bool:
+        return self._registration._thread.is_alive()
+
+    def close(self) -> None:
+        self._registration.close()
+
+
+class FirebaseStorage(Storage):
+    name = "firebase"
+
+    def __init__(self, creds: str, db_url: str, timeout: float = 10.0, pool_size: int = 32):
+        super().__init__()
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(json.loads(creds))
+            firebase_admin.initialize_app(cred, {"databaseURL": db_url, "httpTimeout": timeout})
+        # One keep-alive pool big enough for every session's concurrent reads (the default keeps
+        # 10 connections). Retries are left to ResilientStorage, which knows the call's deadline.
+        # firebase_admin has no option for either, so this tunes its requests session, a private
+        # attribute: requirements.txt pins the major version it was checked against.
+        session = getattr(getattr(db.reference("/"), "_client", None), "session", None)
+        if session is None:
+            log.warning("firebase_admin's HTTP session not found; keeping its default pool and retries")
+        else:
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+
+    def is_outage(self, error: Exception) -> bool:
+        """Timeouts, connection failures, 429 and 5xx; other Firebase errors are rejections."""
+        if isinstance(error, exceptions.FirebaseError):
+            response = error.http_response
+            if response is not None:
+                return response.status_code == 429 or response.status_code >= 500
+            return isinstance(error, (exceptions.DeadlineExceededError, exceptions.UnavailableError,
+                                      exceptions.UnknownError))
+        return super().is_outage(error)
+
+    @staticmethod
+    def _ref(path: str):
+        return db.reference("/" + join(path))
+
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    def get(self, path: str, shallow: bool = False):
+        return self._ref(path).get(shallow=shallow)
+
+    def set(self, path: str, value) -> None:
+        self._ref(path).set(value)
+
+    def update(self, path: str, values: dict) -> None:
+        self._ref(path).update(values)
+
+    def delete(self, path: str) -> None:
+        self._ref(path).delete()
+
+    def push(self, path: str, value="") -> str:
+        return self._ref(path).push(value).key
+
+    def transaction(self, path: str, fn):
+        return self._ref(path).transaction(fn)
+
+    def query(self, path: str, order_by: str, start_at=None, end_at=None, limit_to_first=None) -> dict:
+        ref = self._ref(path)
+        query = ref.order_by_key() if order_by == "$key" else ref.order_by_child(order_by)
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        if limit_to_first is not None:
+            query = query.limit_to_first(limit_to_first)
+        try:
+            return dict(query.get() or {})
+        except (exceptions.InvalidArgumentError, exceptions.FailedPreconditionError) as e:
+            raise QueryError(str(e)) from e
+
+    def listen(self, path: str, callback):
+        return _FirebaseRegistration(self._ref(path).listen(callback))
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,84 @@
+# utils/storage/instrumented.py
+"""Wraps a backend so every call is a timing span with its payload size (see utils/instrumentation.py)."""
+import json
+
+from utils.instrumentation import span
+from utils.storage.base import Reference, Storage, split
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str)) if value is not None else 0
+
+
+def _label(path: str) -> str:
+    """Span label for a path, with ids dropped: `barbers/{id}/walkins/{key}` -> `walkins`."""
+    parts = split(path)
+    if parts[:1] == ["barbers"]:
+        return parts[2] if len(parts) > 2 else "barber"
+    return parts[0] if parts else "/"
+
+
+class InstrumentedStorage(Storage):
+    def __init__(self, inner: Storage):
+        super().__init__()
+        self.inner = inner
+        self.name = inner.name
+
+    @property
+    def degraded(self) -> bool:
+        return self.inner.degraded
+
+    def is_outage(self, error: Exception) -> bool:
+        return self.inner.is_outage(error)
+
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    def get(self, path, shallow=False):
+        with span(f"storage.get {_label(path)}") as info:
+            value = self.inner.get(path, shallow=shallow)
+            info["bytes"] = _size(value)
+        return value
+
+    def set(self, path, value):
+        with span(f"storage.set {_label(path)}") as info:
+            info["bytes"] = _size(value)
+            self.inner.set(path, value)
+
+    def update(self, path, values):
+        with span(f"storage.update {_label(path)}") as info:
+            info["bytes"] = _size(values)
+            self.inner.update(path, values)
+
+    def delete(self, path):
+        with span(f"storage.delete {_label(path)}"):
+            self.inner.delete(path)
+
+    def push(self, path, value=""):
+        with span(f"storage.push {_label(path)}") as info:
+            info["bytes"] = _size(value)
+            return self.inner.push(path, value)
+
+    def transaction(self, path, fn):
+        with span(f"storage.transaction {_label(path)}") as info:
+            value = self.inner.transaction(path, fn)
+            info["bytes"] = _size(value)
+        return value
+
+    def query(self, path, order_by, start_at=None, end_at=None, limit_to_first=None):
+        with span(f"storage.query {_label(path)}") as info:
+            value = self.inner.query(path, order_by, start_at, end_at, limit_to_first)
+            info["bytes"] = _size(value)
+        return value
+
+    def listen(self, path, callback):
+        label = f"storage.event {_label(path)}"
+
+        def timed(event):
+            with span(label) as info:
+                info["bytes"] = _size(event.data)
+                callback(event)
+        return self.inner.listen(path, timed)
+
+    def close(self) -> None:
+        self.inner.close()
@@ -0,0 +1,50 @@
+# utils/storage/memory.py
+"""In-process backend: one nested dict. For offline runs, demos and load tests."""
+import copy
+
+from utils.storage.base import Storage, split
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self, data: dict = None):
+        super().__init__()
+        self._data = copy.deepcopy(data) if data else {}
+
+    def _read(self, path: str):
+        node = self._data
+        for part in split(path):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return copy.deepcopy(node)
+
+    def _write(self, changes: dict) -> None:
+        for path, value in changes.items():
+            parts = split(path)
+            if not parts:
+                self._data = copy.deepcopy(value) if isinstance(value, dict) else {}
+                continue
+
+            # Walk down, creating (or replacing leaf values with) dicts on the way
+            trail = [self._data]
+            node = self._data
+            for part in parts[:-1]:
+                if not isinstance(node.get(part), dict):
+                    if value is None:
+                        break  # nothing stored there to delete
+                    node[part] = {}
+                node = node[part]
+                trail.append(node)
+            else:
+                if value is None:
+                    node.pop(parts[-1], None)
+                else:
+                    node[parts[-1]] = copy.deepcopy(value)
+
+                # Drop parents that are now empty
+                for depth in range(len(parts) - 1, 0, -1):
+                    if trail[depth]:
+                        break
+                    trail[depth - 1].pop(parts[depth - 1], None)
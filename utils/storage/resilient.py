@@ -0,0 +1,187 @@
+# utils/storage/resilient.py
+"""
+Deadlines, retries and a circuit breaker around a backend, so one slow or failing
+request can't hang a rerun.
+
+- Every call has a deadline (`deadline` seconds across all of its attempts). Calls run
+  on a small pool so a stuck request is abandoned rather than waited on; the pool
+  threads themselves are freed by the backend's own HTTP timeout.
+- Failed reads, and writes that are safe to repeat (set, delete, updates without server
+  values), are retried with full-jitter exponential backoff while the deadline allows.
+  Pushes and transactions are not, since a timed-out attempt may still have landed.
+- After `failures` calls in a row fail, the breaker opens for `cooldown` seconds: calls
+  fail fast with StorageUnavailable, and reads are answered from the last good result of
+  the same read. Then one trial call is let through; if it succeeds the breaker closes.
+
+Only outages are retried and counted: timeouts, connection failures and server errors
+(see Storage.is_outage). A rejection means the backend answered: permission denied,
+invalid data, a bad path, or a query missing its index (QueryError). So does an
+exception raised by a transaction's own function, which aborts it on purpose. Those are
+not retried or counted as failures, and reach the caller unchanged.
+"""
+import copy
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.storage.base import Reference, Storage, StorageUnavailable, has_server_values, join
+
+log = logging.getLogger(__name__)
+
+
+class _Aborted(Exception):
+    """Carries an exception raised by a transaction function out through _call()."""
+
+
+class CircuitBreaker:
+    """closed -> (failures in a row) -> open -> (cooldown) -> half-open -> closed or open."""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._count = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if time.monotonic() - self._opened_at < self.cooldown else "half-open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True  # one trial call at a time while half-open
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                log.info("Storage circuit closed")
+            self._count, self._opened_at, self._trial = 0, None, False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._count += 1
+            self._trial = False
+            if self._opened_at is not None or self._count >= self.failures:
+                if self._opened_at is None:
+                    log.warning("Storage circuit opened after %d failures in a row", self._count)
+                self._opened_at = time.monotonic()
+
+
+class ResilientStorage(Storage):
+    def __init__(self, inner: Storage, deadline: float = 5.0, retries: int = 2, backoff: float = 0.1,
+                 failures: int = 5, cooldown: float = 30.0, workers: int = 16, remember: int = 2048):
+        super().__init__()
+        self.inner = inner
+        self.name = inner.name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failures, cooldown)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"storage-{inner.name}")
+        self._last_good = OrderedDict()  # read key -> last successful result
+        self._remember = remember
+
+    @property
+    def degraded(self) -> bool:
+        return self.breaker.state != "closed" or self.inner.degraded
+
+    def is_outage(self, error: Exception) -> bool:
+        return super().is_outage(error) or self.inner.is_outage(error)
+
+    def reference(self, path: str = "") -> Reference:
+        return Reference(self, path)
+
+    # --- Deadline, retries and breaker ---
+    def _call(self, fn, *args, retry: bool = True):
+        what = f"{fn.__name__} {args[0] if args else ''}".strip()
+        if not self.breaker.allow():
+            raise StorageUnavailable(f"{what}: storage circuit is open")
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            future = self._pool.submit(fn, *args)
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except _Aborted as e:
+                self.breaker.success()
+                raise e.__cause__ from None
+            except Exception as e:
+                if not isinstance(e, TimeoutError) and not self.inner.is_outage(e):
+                    self.breaker.success()  # the backend answered; it refused this call
+                    raise
+                future.cancel()
+                attempt += 1
+                pause = random.uniform(0, self.backoff * 2 ** attempt)
+                if not retry or attempt > self.retries or time.monotonic() + pause >= deadline:
+                    self.breaker.failure()
+                    raise StorageUnavailable(f"{what}: failed after {attempt} attempt(s): {e!r}") from e
+                log.info("Retrying %s in %.2fs after %r", what, pause, e)
+                time.sleep(pause)
+            else:
+                self.breaker.success()
+                return result
+
+    def _read_with_fallback(self, key: tuple, fn, *args):
+        try:
+            value = self._call(fn, *args)
+        except StorageUnavailable:
+            with self._lock:
+                if key not in self._last_good:
+                    raise
+                self._last_good.move_to_end(key)
+                value = self._last_good[key]
+            log.debug("Storage degraded, serving the last good copy of %s", key[1] or "/")
+            return copy.deepcopy(value)
+        with self._lock:
+            self._last_good[key] = copy.deepcopy(value)
+            self._last_good.move_to_end(key)
+            while len(self._last_good) > self._remember:
+                self._last_good.popitem(last=False)
+        return value
+
+    # --- Storage API ---
+    def get(self, path, shallow=False):
+        return self._read_with_fallback(("get", join(path), shallow), self.inner.get, path, shallow)
+
+    def query(self, path, order_by, start_at=None, end_at=None, limit_to_first=None):
+        key = ("query", join(path), order_by, start_at, end_at, limit_to_first)
+        return self._read_with_fallback(key, self.inner.query, path, order_by, start_at, end_at, limit_to_first)
+
+    def set(self, path, value):
+        self._call(self.inner.set, path, value)
+
+    def update(self, path, values):
+        self._call(self.inner.update, path, values, retry=not has_server_values(values))
+
+    def delete(self, path):
+        self._call(self.inner.delete, path)
+
+    def push(self, path, value=""):
+        return self._call(self.inner.push, path, value, retry=False)
+
+    def transaction(self, path, fn):
+        def guarded(current):
+            try:
+                return fn(current)
+            except Exception as e:
+                raise _Aborted() from e
+        return self._call(self.inner.transaction, path, guarded, retry=False)
+
+    def listen(self, path, callback):
+        return self.inner.listen(path, callback)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.inner.close()
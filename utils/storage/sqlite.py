@@ -0,0 +1,130 @@
+# utils/storage/sqlite.py
+"""
+Local single-file backend for small shops: the tree is stored as one row per leaf value.
+
+    nodes(path PRIMARY KEY, value, gp, leaf)
+
+`path` is the full slash path of a leaf and `value` its JSON encoding. A subtree is a
+primary-key range scan (`path/` up to `path0`, since "0" sorts right after "/"), and
+`(gp, leaf, value)` indexes "children of gp ordered by their field `leaf`", which is
+what `order_by_child` queries (bookings by slot, walk-ins by joined_at) need.
+
+Listeners see writes made through this process only.
+"""
+import json
+import sqlite3
+
+from utils.storage.base import Storage, join, query_children, split
+
+
+def _flatten(prefix: str, value, rows: list) -> list:
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(join(prefix, key), child, rows)
+    elif value is not None:
+        parts = split(prefix)
+        rows.append((prefix, json.dumps(value, ensure_ascii=False), "/".join(parts[:-2]), parts[-1]))
+    return rows
+
+
+def _subtree_bounds(path: str) -> tuple:
+    return path + "/", path + "0"
+
+
+class SQLiteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, db_path: str = "queue.sqlite3"):
+        super().__init__()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " path TEXT PRIMARY KEY, value TEXT NOT NULL, gp TEXT NOT NULL, leaf TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_by_child ON nodes (gp, leaf, value)")
+
+    def _rows(self, path: str) -> list:
+        if not path:
+            return self._conn.execute("SELECT path, value FROM nodes").fetchall()
+        lo, hi = _subtree_bounds(path)
+        return self._conn.execute(
+            "SELECT path, value FROM nodes WHERE path = ? OR (path > ? AND path < ?)", (path, lo, hi)
+        ).fetchall()
+
+    @staticmethod
+    def _build(path: str, rows: list):
+        tree = None
+        for row_path, value in rows:
+            value = json.loads(value)
+            if row_path == path:
+                return value
+            parts = split(row_path[len(path):])
+            tree = tree if isinstance(tree, dict) else {}
+            node = tree
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+            node[parts[-1]] = value
+        return tree
+
+    def _read(self, path: str):
+        with self._lock:
+            return self._build(path, self._rows(path))
+
+    def _write(self, changes: dict) -> None:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                for path, value in changes.items():
+                    # Replace the subtree, and any leaf stored at one of its ancestors
+                    if path:
+                        lo, hi = _subtree_bounds(path)
+                        cur.execute("DELETE FROM nodes WHERE path = ? OR (path > ? AND path < ?)", (path, lo, hi))
+                        parts = split(path)
+                        ancestors = ["/".join(parts[:i]) for i in range(1, len(parts))]
+                        cur.executemany("DELETE FROM nodes WHERE path = ?", [(a,) for a in ancestors])
+                    else:
+                        cur.execute("DELETE FROM nodes")
+                    cur.executemany(
+                        "INSERT INTO nodes (path, value, gp, leaf) VALUES (?, ?, ?, ?)",
+                        _flatten(path, value, []),
+                    )
+                cur.execute("COMMIT")
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def is_outage(self, error: Exception) -> bool:
+        return isinstance(error, sqlite3.OperationalError) or super().is_outage(error)  # e.g. locked, disk I/O
+
+    def query(self, path: str, order_by: str, start_at=None, end_at=None, limit_to_first=None) -> dict:
+        path = join(path)
+        with self._lock:
+            if order_by == "$key":
+                # Key range as a primary-key range; exact bounds are applied below
+                lo = join(path, start_at) if start_at is not None else path + "/"
+                hi = join(path, end_at) + "/\U0010ffff" if end_at is not None else path + "0"
+                rows = self._conn.execute(
+                    "SELECT path, value FROM nodes WHERE path >= ? AND path <= ?", (lo, hi)
+                ).fetchall()
+                children = self._build(path, rows) or {}
+            else:
+                sql = "SELECT path FROM nodes WHERE gp = ? AND leaf = ?"
+                params = [path, order_by]
+                # JSON-encoded strings keep their order, so string bounds can use the index
+                if isinstance(start_at, str):
+                    sql += " AND value >= ?"
+                    params.append(json.dumps(start_at, ensure_ascii=False))
+                if isinstance(end_at, str):
+                    sql += " AND value <= ?"
+                    params.append(json.dumps(end_at, ensure_ascii=False))
+                keys = {split(row[0])[-2] for row in self._conn.execute(sql, params)}
+                children = {key: self._build(join(path, key), self._rows(join(path, key))) for key in keys}
+        return query_children(children if isinstance(children, dict) else {}, order_by,
+                              start_at, end_at, limit_to_first)
+
+    def close(self) -> None:
+        super().close()
+        self._conn.close()